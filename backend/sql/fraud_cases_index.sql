@@ -0,0 +1,3 @@
+-- Lets load_fraud_case's lookup (WHERE userName = ? AND case_status = ?)
+-- seek straight to the pending case instead of scanning fraud_cases.
+ALTER TABLE fraud_cases ADD INDEX idx_user_status (userName, case_status);
@@ -1,5 +1,7 @@
+import asyncio
+import difflib
 import logging
-import json
+import re
 
 from dotenv import load_dotenv
 from livekit.agents import (
@@ -12,73 +14,18 @@ from livekit.agents import (
     WorkerOptions,
     cli,
     metrics,
-    tokenize,
 )
-from livekit.plugins import murf, silero, google, deepgram, noise_cancellation
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 from livekit.agents import function_tool, RunContext
 
+from _shared import build_pipeline, get_noise_cancellation, write_json
+
 logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
 
 
-class Assistant(Agent):
-    def __init__(self):
-        # Store lead information instead of order
-        self.lead = {
-            "name": None,
-            "company": None,
-            "email": None,
-            "role": None,
-            "use_case": None,
-            "team_size": None,
-            "timeline": None
-        }
-        
-        # Load FAQ data (preload company information)
-        self.faq_data = self.load_faq()
-        
-        super().__init__(
-            instructions=f"""
-        You are a friendly Sales Development Representative (SDR) for Razorpay, India's leading payment gateway and financial services company.
-        
-        COMPANY INFORMATION:
-        {self.faq_data}
-        
-        YOUR ROLE:
-        1. Greet the visitor warmly and ask what brought them here.
-        2. Understand their business needs and what they're working on.
-        3. Answer their questions about Razorpay using the FAQ information provided above.
-        4. Naturally collect lead information during the conversation.
-        5. When they indicate they're done (e.g., "that's all", "I'm done", "thanks, bye"), call save_lead to store their information.
-        
-        LEAD FIELDS TO COLLECT (ask naturally during conversation):
-        - Name
-        - Company name
-        - Email address
-        - Role/Job title
-        - Use case (what they want to use Razorpay for)
-        - Team size
-        - Timeline (now / soon / later)
-        
-        CONVERSATION STYLE:
-        - Be warm, professional, and consultative
-        - Ask open-ended questions to understand their needs
-        - Don't interrogate - weave questions naturally into the conversation
-        - Use the FAQ to answer product/pricing/company questions accurately
-        - Don't make up information not in the FAQ
-        - Keep responses conversational and concise
-        
-        When answering questions:
-        - Base answers strictly on the FAQ information provided
-        - If asked about something not in the FAQ, politely say you'll have someone from the team follow up
-        - Focus on understanding their specific needs and use case
-        """,
-        )
-    
-    def load_faq(self):
-        faq = """
+_FAQ_TEXT = """
         RAZORPAY - COMPANY FAQ
         
         WHAT WE DO:
@@ -131,8 +78,144 @@ class Assistant(Agent):
         - Dedicated account manager for enterprise clients
         - Comprehensive documentation and resources
         """
-        return faq
+
+
+def _parse_faq_sections(text: str) -> dict[str, str]:
+    """Split the FAQ into {heading: body}, keyed by the lowercased uppercase headings."""
+    sections: dict[str, list[str]] = {}
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        if line.endswith(":") and line.isupper():
+            current = line[:-1].lower()
+            sections[current] = []
+        elif current and line:
+            sections[current].append(line)
+    return {heading: "\n".join(lines) for heading, lines in sections.items()}
+
+
+# Parsed once at import so lookup_faq is a dict lookup
+_FAQ_SECTIONS = _parse_faq_sections(_FAQ_TEXT)
+
+# Filler words that would otherwise tie questions to a heading ("what", "this")
+_FAQ_STOPWORDS = {
+    "and", "for", "the", "with", "via", "per", "are", "our", "all", "etc",
+    "what", "this", "does", "how", "you", "your", "can",
+}
+
+
+def _faq_words(text: str) -> set[str]:
+    return {
+        word for word in re.findall(r"[a-z0-9]+", text.lower())
+        if len(word) > 2 and word not in _FAQ_STOPWORDS
+    }
+
+
+# Words that name each section (its heading, plus what callers say instead of
+# "pricing") and words from its body, for topics like "UPI" or "Shopify"
+_FAQ_NAME_WORDS = {heading: _faq_words(heading) for heading in _FAQ_SECTIONS}
+_FAQ_NAME_WORDS["pricing"] |= {
+    "price", "prices", "cost", "costs", "fee", "fees", "charge", "charges", "rate", "rates",
+}
+_FAQ_BODY_WORDS = {heading: _faq_words(body) for heading, body in _FAQ_SECTIONS.items()}
+
+
+def _find_faq_section(topic: str):
+    """Resolve a spoken topic to a FAQ heading, or None if nothing fits."""
+    topic_lower = topic.strip().lower()
+    if topic_lower in _FAQ_SECTIONS:
+        return topic_lower
+    words = _faq_words(topic_lower)
+    if words:
+        # A word naming a section counts double one found only in its body;
+        # ties go to the section listed first
+        scores = {
+            heading: 2 * len(words & _FAQ_NAME_WORDS[heading]) + len(words & _FAQ_BODY_WORDS[heading])
+            for heading in _FAQ_SECTIONS
+        }
+        best = max(scores, key=scores.get)
+        if scores[best]:
+            return best
+    # Loose match on headings for misheard or filler-only topics ("pricng",
+    # "what do you do")
+    close = difflib.get_close_matches(topic_lower, _FAQ_SECTIONS.keys(), n=1, cutoff=0.6)
+    return close[0] if close else None
+
+
+_SDR_INSTRUCTIONS = f"""
+        You are a friendly Sales Development Representative (SDR) for Razorpay, India's leading payment gateway and financial services company.
+        
+        COMPANY INFORMATION:
+        Company details live in the FAQ. When asked about products, pricing, features or anything else about Razorpay, call lookup_faq first.
+        FAQ topics: {", ".join(_FAQ_SECTIONS)}
+        
+        YOUR ROLE:
+        1. Greet the visitor warmly and ask what brought them here.
+        2. Understand their business needs and what they're working on.
+        3. Answer their questions about Razorpay using the FAQ information returned by lookup_faq.
+        4. Naturally collect lead information during the conversation.
+        5. When they indicate they're done (e.g., "that's all", "I'm done", "thanks, bye"), call save_lead to store their information.
+        
+        LEAD FIELDS TO COLLECT (ask naturally during conversation):
+        - Name
+        - Company name
+        - Email address
+        - Role/Job title
+        - Use case (what they want to use Razorpay for)
+        - Team size
+        - Timeline (now / soon / later)
+        
+        CONVERSATION STYLE:
+        - Be warm, professional, and consultative
+        - Ask open-ended questions to understand their needs
+        - Don't interrogate - weave questions naturally into the conversation
+        - Use the FAQ to answer product/pricing/company questions accurately
+        - Don't make up information not in the FAQ
+        - Keep responses conversational and concise
+        
+        When answering questions:
+        - Base answers strictly on the FAQ information returned by lookup_faq
+        - If asked about something not in the FAQ, politely say you'll have someone from the team follow up
+        - Focus on understanding their specific needs and use case
+        """
+
+
+class Assistant(Agent):
+    # Immutable FAQ data is shared by every instance
+    faq_data = _FAQ_TEXT
+
+    def __init__(self):
+        # Store lead information instead of order
+        self.lead = {
+            "name": None,
+            "company": None,
+            "email": None,
+            "role": None,
+            "use_case": None,
+            "team_size": None,
+            "timeline": None
+        }
+        
+        super().__init__(instructions=_SDR_INSTRUCTIONS)
     
+    @function_tool
+    async def lookup_faq(self, context: RunContext, topic: str):
+        """Look up a section of the Razorpay company FAQ.
+
+        Args:
+            topic: The FAQ topic, one of: {topics}
+        """
+        heading = _find_faq_section(topic)
+        logger.info(f"FAQ lookup for '{topic}' matched section: {heading}")
+
+        if not heading:
+            return "That isn't covered in the FAQ. Let the visitor know someone from the team will follow up on it."
+        return f"{heading.upper()}:\n{_FAQ_SECTIONS[heading]}"
+
+    # Argument docs are read from __doc__ when the tool schema is built, so
+    # filling in the headings here keeps them in step with the FAQ text
+    lookup_faq.__doc__ = lookup_faq.__doc__.format(topics=", ".join(_FAQ_SECTIONS))
+
     @function_tool
     async def save_lead(
         self, 
@@ -156,8 +239,7 @@ class Assistant(Agent):
         }
         
         try:
-            with open("lead_summary.json", "w") as f:
-                json.dump(self.lead, f, indent=2)
+            await asyncio.to_thread(write_json, "lead_summary.json", self.lead)
             logger.info(f"Lead saved successfully: {self.lead}")
             
             # Create verbal summary
@@ -190,9 +272,13 @@ class Assistant(Agent):
 
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
-    # Hint - You can also preload and preprocess FAQ data here for better performance
-    # For example: proc.userdata["faq"] = load_and_process_faq()
+    # Short minimum so TTS starts on the first few words from the LLM
+    build_pipeline(proc, min_sentence_len=3)
+
+    # The agent holds no room-specific state until its session starts, so
+    # build it here too; entrypoint takes it exactly once.
+    if "agent" not in proc.userdata:
+        proc.userdata["agent"] = Assistant()
 
 
 async def entrypoint(ctx: JobContext):
@@ -206,21 +292,13 @@ async def entrypoint(ctx: JobContext):
     session = AgentSession(
         # Speech-to-text (STT) is your agent's ears, turning the user's speech into text that the LLM can understand
         # See all available models at https://docs.livekit.io/agents/models/stt/
-        stt=deepgram.STT(model="nova-3"),
+        stt=ctx.proc.userdata["stt"],
         # A Large Language Model (LLM) is your agent's brain, processing user input and generating a response
         # See all available models at https://docs.livekit.io/agents/models/llm/
-        llm=google.LLM(
-                model="gemini-2.5-flash",
-            ),
+        llm=ctx.proc.userdata["llm"],
         # Text-to-speech (TTS) is your agent's voice, turning the LLM's text into speech that the user can hear
         # See all available models as well as voice selections at https://docs.livekit.io/agents/models/tts/
-        tts=murf.TTS(
-            voice="en-US-matthew", 
-            style="Conversation",
-            tokenizer=tokenize.basic.SentenceTokenizer(
-                min_sentence_len=15,  # Longer sentences
-            )
-        ),
+        tts=ctx.proc.userdata["tts"],
         # VAD and turn detection are used to determine when the user is speaking and when the agent should respond
         # See more at https://docs.livekit.io/agents/build/turns
         turn_detection=MultilingualModel(),
@@ -265,11 +343,11 @@ async def entrypoint(ctx: JobContext):
 
     # Start the session, which initializes the voice pipeline and warms up the models
     await session.start(
-        agent=Assistant(),
+        agent=ctx.proc.userdata.pop("agent", None) or Assistant(),
         room=ctx.room,
         room_input_options=RoomInputOptions(
             # For telephony applications, use `BVCTelephony` for best results
-            noise_cancellation=noise_cancellation.BVC(),
+            noise_cancellation=get_noise_cancellation(),
         ),
     )
 
@@ -0,0 +1,66 @@
+"""Process-wide resources shared by every agent's prewarm."""
+
+import functools
+import json
+from typing import Optional
+
+from livekit.agents import JobProcess, tokenize
+from livekit.plugins import deepgram, google, murf, noise_cancellation, silero
+
+
+@functools.lru_cache(maxsize=1)
+def get_vad() -> silero.VAD:
+    """Load the Silero VAD model once per process and reuse it for every job."""
+    return silero.VAD.load()
+
+
+@functools.lru_cache(maxsize=None)
+def get_sentence_tokenizer(min_sentence_len: int = 2) -> tokenize.basic.SentenceTokenizer:
+    """Sentence splitter for the TTS. It keeps no per-stream state, so one per
+    setting serves every TTS in the process."""
+    return tokenize.basic.SentenceTokenizer(min_sentence_len=min_sentence_len)
+
+
+@functools.lru_cache(maxsize=1)
+def get_noise_cancellation():
+    """BVC room input options. BVC() only describes which filter to enable."""
+    return noise_cancellation.BVC()
+
+
+@functools.lru_cache(maxsize=None)
+def get_tts(voice: str = "en-US-matthew", min_sentence_len: int = 2) -> murf.TTS:
+    """One Murf client per voice, shared by the session and any agent that
+    overrides the voice."""
+    return murf.TTS(
+        voice=voice,
+        style="Conversation",
+        tokenizer=get_sentence_tokenizer(min_sentence_len),
+        text_pacing=True,
+    )
+
+
+def build_pipeline(proc: JobProcess, voice: str = "en-US-matthew", min_sentence_len: int = 2) -> None:
+    """Put the VAD and the STT/LLM/TTS clients in ``proc.userdata`` for entrypoint.
+
+    Called from prewarm so joining a room doesn't pay for their setup; safe to
+    call again. The turn detector is not built here: it binds to the job's
+    inference executor, which doesn't exist yet during prewarm. STT and TTS get
+    no http_session on purpose, so they pick up the job's shared aiohttp
+    session (utils.http_context) on first use and reuse one keep-alive pool.
+    """
+    if "vad" not in proc.userdata:
+        proc.userdata["vad"] = get_vad()
+    if "stt" not in proc.userdata:
+        proc.userdata["stt"] = deepgram.STT(model="nova-3")
+        proc.userdata["llm"] = google.LLM(model="gemini-2.5-flash")
+        proc.userdata["tts"] = get_tts(voice, min_sentence_len)
+
+
+def write_json(path: str, data: dict, indent: Optional[int] = None) -> None:
+    """Overwrite ``path`` with ``data``; compact unless ``indent`` is given.
+
+    Blocking, so agents call it through asyncio.to_thread.
+    """
+    separators = None if indent else (",", ":")
+    with open(path, "w") as f:
+        f.write(json.dumps(data, indent=indent, separators=separators))
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 
 from dotenv import load_dotenv
@@ -11,31 +12,20 @@ from livekit.agents import (
     WorkerOptions,
     cli,
     metrics,
-    tokenize,
     # function_tool,
     # RunContext
 )
-from livekit.plugins import murf, silero, google, deepgram, noise_cancellation
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 from livekit.agents import function_tool, RunContext
-import json
+
+from _shared import build_pipeline, get_noise_cancellation, write_json
 
 logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
 
 
-class Assistant(Agent):
-    def __init__(self):
-        self.order = {
-            "drinkType": None,
-            "size": None,
-            "milk": None,
-            "extras": [],
-            "name": None
-        }
-        super().__init__(
-            instructions="""
+_BARISTA_INSTRUCTIONS = """
         You are a friendly coffee shop barista for Starbucks (or any brand you want).
         Your job is to take the customer's order through voice.
 
@@ -60,8 +50,19 @@ class Assistant(Agent):
 
         4. Speak like a friendly barista.
         5. Keep responses short and simple.
-        """,
-        )
+        """
+
+
+class Assistant(Agent):
+    def __init__(self):
+        self.order = {
+            "drinkType": None,
+            "size": None,
+            "milk": None,
+            "extras": [],
+            "name": None
+        }
+        super().__init__(instructions=_BARISTA_INSTRUCTIONS)
 
     @function_tool
     async def save_order(
@@ -91,8 +92,7 @@ class Assistant(Agent):
         }
         
         try:
-            with open("order_summary.json", "w") as f:
-                json.dump(self.order, f, indent=2)
+            await asyncio.to_thread(write_json, "order_summary.json", self.order)
             logger.info(f"Order saved successfully: {self.order}")
             return f"Perfect! I've saved your order for {name}. Your {size} {drink_type} with {milk} milk will be ready soon!"
         except Exception as e:
@@ -117,7 +117,12 @@ class Assistant(Agent):
 
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    build_pipeline(proc)
+
+    # The agent holds no room-specific state until its session starts, so
+    # build it here too; entrypoint takes it exactly once.
+    if "agent" not in proc.userdata:
+        proc.userdata["agent"] = Assistant()
 
 
 async def entrypoint(ctx: JobContext):
@@ -131,20 +136,13 @@ async def entrypoint(ctx: JobContext):
     session = AgentSession(
         # Speech-to-text (STT) is your agent's ears, turning the user's speech into text that the LLM can understand
         # See all available models at https://docs.livekit.io/agents/models/stt/
-        stt=deepgram.STT(model="nova-3"),
+        stt=ctx.proc.userdata["stt"],
         # A Large Language Model (LLM) is your agent's brain, processing user input and generating a response
         # See all available models at https://docs.livekit.io/agents/models/llm/
-        llm=google.LLM(
-                model="gemini-2.5-flash",
-            ),
+        llm=ctx.proc.userdata["llm"],
         # Text-to-speech (TTS) is your agent's voice, turning the LLM's text into speech that the user can hear
         # See all available models as well as voice selections at https://docs.livekit.io/agents/models/tts/
-        tts=murf.TTS(
-                voice="en-US-matthew", 
-                style="Conversation",
-                tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
-                text_pacing=True
-            ),
+        tts=ctx.proc.userdata["tts"],
         # VAD and turn detection are used to determine when the user is speaking and when the agent should respond
         # See more at https://docs.livekit.io/agents/build/turns
         turn_detection=MultilingualModel(),
@@ -189,11 +187,11 @@ async def entrypoint(ctx: JobContext):
 
     # Start the session, which initializes the voice pipeline and warms up the models
     await session.start(
-        agent=Assistant(),
+        agent=ctx.proc.userdata.pop("agent", None) or Assistant(),
         room=ctx.room,
         room_input_options=RoomInputOptions(
             # For telephony applications, use `BVCTelephony` for best results
-            noise_cancellation=noise_cancellation.BVC(),
+            noise_cancellation=get_noise_cancellation(),
         ),
     )
 
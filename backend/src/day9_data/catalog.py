@@ -1,12 +1,55 @@
+import asyncio
+import difflib
+import functools
 import json
+import logging
 import os
-from datetime import datetime
+import secrets
+import threading
+from bisect import bisect_right
+from datetime import datetime, timezone
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
 # Get the directory where this script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PRODUCTS_FILE = os.path.join(SCRIPT_DIR, "products.json")
-ORDERS_FILE = os.path.join(SCRIPT_DIR, "orders.json")
+# Orders are an append-only JSON Lines log: one order object per line
+ORDERS_FILE = os.path.join(SCRIPT_DIR, "orders.jsonl")
+
+# In-memory product index, built on first use and rebuilt only when
+# products.json changes on disk.
+# Bucket keys are lowercased so lookups match the case-insensitive filters.
+_INDEX_LOCK = threading.Lock()
+_INDEX_LOADED = False
+_INDEX_MTIME: Optional[float] = None
+_PRODUCTS: list[dict] = []
+_BY_NAME: dict[str, dict] = {}
+# Keyed by casefolded name
+_BY_NAME_LC: dict[str, dict] = {}
+_BY_CATEGORY: dict[str, list[dict]] = {}
+_BY_COLOR: dict[str, list[dict]] = {}
+# All product prices in ascending order, for bisect
+_PRICES: list[int] = []
+# The same, per lowercased category
+_PRICES_BY_CATEGORY: dict[str, list[int]] = {}
+# Lowercased (category, color, name + description) per product id
+_SEARCH_KEYS: dict[str, tuple[str, str, str]] = {}
+# list_products results keyed by normalized filters; reset with the index
+_LIST_CACHE: dict[tuple, tuple[dict, ...]] = {}
+_LIST_CACHE_MAX = 256
+
+# In-memory mirror of the order log. Other worker processes append to the same
+# file, so like the product index it is refreshed whenever the file changes,
+# reading only the lines added since the last look.
+_ORDERS_LOCK = threading.RLock()
+# (inode, size, mtime) of the log when it was last read, None if never read
+_ORDERS_SIGNATURE: Optional[tuple[int, int, int]] = None
+# Byte offset just past the last complete line read
+_ORDERS_OFFSET = 0
+_ORDERS: list[dict] = []
+_ORDERS_BY_ID: dict[str, dict] = {}
 
 
 def load_products() -> list[dict]:
@@ -14,40 +57,233 @@ def load_products() -> list[dict]:
     try:
         with open(PRODUCTS_FILE, "r") as f:
             products = json.load(f)
-            print(f"✓ Loaded {len(products)} products from {PRODUCTS_FILE}")
+            logger.info("Loaded %d products from %s", len(products), PRODUCTS_FILE)
             return products
     except FileNotFoundError:
-        print(f"✗ Products file not found: {PRODUCTS_FILE}")
+        logger.error("Products file not found: %s", PRODUCTS_FILE)
         return []
     except Exception as e:
-        print(f"✗ Error loading products: {e}")
+        logger.error("Error loading products: %s", e)
         return []
 
 
+def _products_mtime() -> Optional[float]:
+    try:
+        return os.stat(PRODUCTS_FILE).st_mtime
+    except OSError:
+        return None
+
+
+def _ensure_index() -> None:
+    """Build the lookup index, rebuilding it if products.json has changed."""
+    global _INDEX_LOADED, _INDEX_MTIME, _PRODUCTS, _BY_NAME, _BY_NAME_LC, _BY_CATEGORY
+    global _BY_COLOR, _PRICES, _PRICES_BY_CATEGORY, _SEARCH_KEYS, _LIST_CACHE
+    mtime = _products_mtime()
+    if _INDEX_LOADED and mtime == _INDEX_MTIME:
+        return
+    with _INDEX_LOCK:
+        if _INDEX_LOADED and mtime == _INDEX_MTIME:
+            return
+        products = load_products()
+        by_name: dict[str, dict] = {}
+        by_name_lc: dict[str, dict] = {}
+        by_category: dict[str, list[dict]] = {}
+        by_color: dict[str, list[dict]] = {}
+        search_keys: dict[str, tuple[str, str, str]] = {}
+        for product in products:
+            category_lc = product.get("category", "").lower()
+            color_lc = product.get("color", "").lower()
+            # Newline-joined so a keyword can't match across the two fields
+            haystack_lc = f'{product.get("name", "")}\n{product.get("description", "")}'.lower()
+            search_keys[product["id"]] = (category_lc, color_lc, haystack_lc)
+            by_name[product["name"]] = product
+            by_name_lc[product["name"].casefold()] = product
+            by_category.setdefault(category_lc, []).append(product)
+            by_color.setdefault(color_lc, []).append(product)
+
+        # Swap in the new structures so concurrent readers never see a half-built index
+        _PRODUCTS = products
+        _BY_NAME = by_name
+        _BY_NAME_LC = by_name_lc
+        _BY_CATEGORY = by_category
+        _BY_COLOR = by_color
+        _PRICES = sorted(p.get("price", 0) for p in products)
+        _PRICES_BY_CATEGORY = {
+            cat: sorted(p.get("price", 0) for p in bucket)
+            for cat, bucket in by_category.items()
+        }
+        _SEARCH_KEYS = search_keys
+        _LIST_CACHE = {}
+        _resolve_name.cache_clear()
+        _INDEX_MTIME = mtime
+        _INDEX_LOADED = True
+
+
+def catalog_version() -> Optional[float]:
+    """Return a token that changes whenever the product index is rebuilt."""
+    _ensure_index()
+    return _INDEX_MTIME
+
+
+def preload() -> None:
+    """Build the product index ahead of first use.
+
+    The order log is left alone: prewarmed processes can sit idle for a long
+    time, and reads refresh it from disk anyway.
+    """
+    _ensure_index()
+
+
 def load_orders() -> list[dict]:
-    """Load orders from JSON file."""
+    """Load orders from the JSON Lines log."""
     try:
         with open(ORDERS_FILE, "r") as f:
-            data = json.load(f)
-            # Ensure it's a list, not a dict
-            if isinstance(data, list):
-                print(f"Loaded {len(data)} orders from {ORDERS_FILE}")
-                return data
-            else:
-                print(f"Orders file contains {type(data)}, resetting to empty list")
-                return []
+            orders = [json.loads(line) for line in f if line.strip()]
+            logger.debug("Loaded %d orders from %s", len(orders), ORDERS_FILE)
+            return orders
     except FileNotFoundError:
-        print(f"Orders file not found, creating new one")
+        logger.info("Orders file not found, creating new one")
         return []
     except Exception as e:
-        print(f"Error loading orders: {e}")
+        logger.error("Error loading orders: %s", e)
         return []
 
 
+def _orders_signature() -> Optional[tuple[int, int, int]]:
+    try:
+        st = os.stat(ORDERS_FILE)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def _ensure_orders() -> None:
+    """Bring the in-memory mirror up to date with the order log on disk."""
+    global _ORDERS_SIGNATURE, _ORDERS_OFFSET
+    if _orders_signature() == _ORDERS_SIGNATURE:
+        return
+    with _ORDERS_LOCK:
+        signature = _orders_signature()
+        if signature == _ORDERS_SIGNATURE:
+            return
+        previous = _ORDERS_SIGNATURE
+        if signature is None or previous is None or signature[0] != previous[0] or signature[1] < _ORDERS_OFFSET:
+            # First read, or the log was removed or rewritten (save_orders)
+            _ORDERS.clear()
+            _ORDERS_BY_ID.clear()
+            _ORDERS_OFFSET = 0
+        if signature is not None:
+            with open(ORDERS_FILE, "rb") as f:
+                f.seek(_ORDERS_OFFSET)
+                data = f.read()
+            # Leave a line another process is still writing for the next look
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                if not line.strip():
+                    continue
+                try:
+                    order = json.loads(line)
+                except ValueError as e:
+                    logger.error("Skipping malformed order log line: %s", e)
+                    continue
+                _ORDERS.append(order)
+                _ORDERS_BY_ID[order["id"]] = order
+            _ORDERS_OFFSET += end
+        _ORDERS_SIGNATURE = signature
+
+
+class OrderLog:
+    """Appends orders to the log in batches instead of one write per order.
+
+    Records are buffered and written (and fsynced) together once
+    ``max_batch`` are pending or ``max_delay`` seconds have passed, whichever
+    comes first. ``append`` resolves only after the batch holding the record
+    is on disk, so an order is durable before it is confirmed to the user.
+    """
+
+    def __init__(self, path: str, max_batch: int = 16, max_delay: float = 0.05):
+        self.path = path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # Strong refs to size-triggered flushes; the loop only keeps weak ones
+        self._flushes: set[asyncio.Task] = set()
+
+    async def append(self, record: dict) -> None:
+        """Queue a record and wait until it has been written."""
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((json.dumps(record, separators=(",", ":")) + "\n", fut))
+        if len(self._pending) >= self.max_batch:
+            task = asyncio.create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+        await fut
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.max_delay)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Write out everything buffered so far."""
+        timer, self._flush_task = self._flush_task, None
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        try:
+            await asyncio.to_thread(self._write, "".join(line for line, _ in batch))
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        else:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_result(None)
+
+    def _write(self, data: str) -> None:
+        with open(self.path, "a") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+_ORDER_LOG = OrderLog(ORDERS_FILE)
+
+
+async def flush_orders() -> None:
+    """Force any buffered orders to disk, e.g. on shutdown."""
+    await _ORDER_LOG.flush()
+
+
 def save_orders(orders: list[dict]) -> None:
-    """Save orders to JSON file."""
-    with open(ORDERS_FILE, "w") as f:
-        json.dump(orders, f, indent=2)
+    """Rewrite the whole order log, e.g. to compact or migrate it.
+
+    The log is serialized compactly in one buffer and swapped in atomically.
+    Use dump_orders_pretty() for a human-readable view.
+    """
+    global _ORDERS_SIGNATURE, _ORDERS_OFFSET
+    data = "".join(json.dumps(order, separators=(",", ":")) + "\n" for order in orders).encode()
+    tmp_path = ORDERS_FILE + ".tmp"
+    with _ORDERS_LOCK:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, ORDERS_FILE)
+        # Keep the in-memory mirror in step with what is now on disk
+        _ORDERS[:] = orders
+        _ORDERS_BY_ID.clear()
+        _ORDERS_BY_ID.update((order["id"], order) for order in orders)
+        _ORDERS_OFFSET = len(data)
+        _ORDERS_SIGNATURE = _orders_signature()
+
+
+def dump_orders_pretty() -> str:
+    """Return the order log as indented JSON, for debugging."""
+    return json.dumps(load_orders(), indent=2)
 
 
 def list_products(
@@ -68,49 +304,100 @@ def list_products(
     Returns:
         List of matching products
     """
-    products = load_products()
-    print(f"Starting with {len(products)} total products")
-    filtered = products
-    
-    if category:
-        print(f"Filtering by category: {category}")
-        filtered = [p for p in filtered if p.get("category", "").lower() == category.lower()]
-        print(f"After category filter: {len(filtered)} products")
-    
+    _ensure_index()
+    category_lc = category.lower() if category else None
+    color_lc = color.lower() if color else None
+    keyword_lc = keyword.lower() if keyword else None
+
+    # Repeated voice queries ("show me hoodies") hit the memo. Bind it locally
+    # so a result computed during an index rebuild lands in the discarded one.
+    cache = _LIST_CACHE
+    key = (category_lc, max_price or None, color_lc, keyword_lc)
+    cached = cache.get(key)
+    if cached is None:
+        cached = tuple(_filter_products(category_lc, max_price, color_lc, keyword_lc))
+        if len(cache) >= _LIST_CACHE_MAX:
+            # Evict the oldest entry
+            cache.pop(next(iter(cache), None), None)
+        cache[key] = cached
+    return list(cached)
+
+
+def _filter_products(
+    category_lc: Optional[str],
+    max_price: Optional[int],
+    color_lc: Optional[str],
+    keyword_lc: Optional[str],
+) -> list[dict]:
+    """Run the list_products filters against the index; arguments are lowercased."""
+    # Start from the smallest precomputed bucket instead of the full catalog
+    prices = _PRICES
+    if category_lc:
+        candidates = _BY_CATEGORY.get(category_lc, [])
+        prices = _PRICES_BY_CATEGORY.get(category_lc, [])
+    elif color_lc:
+        candidates = _BY_COLOR.get(color_lc, [])
+        color_lc = None  # every product in the color bucket already matches
+    else:
+        candidates = _PRODUCTS
+    logger.debug(
+        "Filtering %d products - category: %s, max_price: %s, color: %s, keyword: %s",
+        len(candidates), category_lc, max_price, color_lc, keyword_lc,
+    )
+
+    # bisect on the sorted prices tells us up front whether the price filter
+    # rules out everything or nothing
     if max_price:
-        print(f"Filtering by max_price: {max_price}")
-        filtered = [p for p in filtered if p.get("price", 0) <= max_price]
-        print(f"After price filter: {len(filtered)} products")
-    
-    if color:
-        print(f"Filtering by color: {color}")
-        filtered = [p for p in filtered if p.get("color", "").lower() == color.lower()]
-        print(f"After color filter: {len(filtered)} products")
-    
-    if keyword:
-        print(f"Filtering by keyword: {keyword}")
-        keyword_lower = keyword.lower()
-        filtered = [
-            p for p in filtered
-            if keyword_lower in p.get("name", "").lower()
-            or keyword_lower in p.get("description", "").lower()
-        ]
-        print(f"After keyword filter: {len(filtered)} products")
-    
-    print(f"Returning {len(filtered)} products")
-    return filtered
+        cutoff = bisect_right(prices, max_price)
+        if cutoff == 0:
+            logger.debug("No products within max_price %s", max_price)
+            return []
+        if cutoff == len(prices):
+            max_price = None
+
+    # Apply the remaining filters in a single pass over the candidates
+    result = []
+    for p in candidates:
+        _, color_key, haystack = _SEARCH_KEYS[p["id"]]
+        if color_lc and color_key != color_lc:
+            continue
+        if max_price and p.get("price", 0) > max_price:
+            continue
+        if keyword_lc and keyword_lc not in haystack:
+            continue
+        result.append(p)
+
+    logger.debug("Returning %d products", len(result))
+    return result
 
 
 def get_product_by_name(product_name: str) -> Optional[dict]:
-    """Get a specific product by name."""
-    products = load_products()
-    for product in products:
-        if product["name"] == product_name:
-            return product
+    """Get a specific product by name.
+
+    Falls back to a case-insensitive match and then to the closest product
+    name, so slightly misheard names still resolve.
+    """
+    _ensure_index()
+    product = _BY_NAME.get(product_name)
+    if product:
+        return product
+    return _resolve_name(product_name.strip().casefold())
+
+
+@functools.lru_cache(maxsize=512)
+def _resolve_name(name_cf: str) -> Optional[dict]:
+    """Resolve a casefolded name, memoized until the index is rebuilt."""
+    product = _BY_NAME_LC.get(name_cf)
+    if product:
+        return product
+    close = difflib.get_close_matches(name_cf, _BY_NAME_LC.keys(), n=1, cutoff=0.8)
+    if close:
+        logger.debug("Resolved product name %r to %r", name_cf, close[0])
+        return _BY_NAME_LC[close[0]]
     return None
 
 
-def create_order(line_items: list[dict]) -> dict:
+async def create_order(line_items: list[dict]) -> dict:
     """
     Create a new order.
     
@@ -120,11 +407,6 @@ def create_order(line_items: list[dict]) -> dict:
     Returns:
         Created order object
     """
-    orders = load_orders()
-    
-    # Generate order ID
-    order_id = f"order-{len(orders) + 1:04d}"
-    
     # Calculate total and build order items
     total = 0
     order_items = []
@@ -152,35 +434,32 @@ def create_order(line_items: list[dict]) -> dict:
         
         order_items.append(order_item)
     
-    # Create order object
+    # Several worker processes append to the log at once, so the ID can't be
+    # a count of the orders one of them has seen; one clock read so the ID
+    # and timestamp agree
+    now = datetime.now(timezone.utc)
     order = {
-        "id": order_id,
+        "id": f"order-{now:%Y%m%d%H%M%S}-{secrets.token_hex(3)}",
         "items": order_items,
         "total": total,
         "currency": "INR",
-        "created_at": datetime.now().isoformat(),
+        "created_at": now.isoformat(timespec="seconds"),
         "status": "confirmed"
     }
-    
-    # Save order
-    orders.append(order)
-    save_orders(orders)
-    
+
+    # Save order, waiting for its batch to reach disk; readers pick it up from there
+    await _ORDER_LOG.append(order)
+
     return order
 
 
 def get_last_order() -> Optional[dict]:
     """Get the most recent order."""
-    orders = load_orders()
-    if orders and len(orders) > 0:
-        return orders[-1]
-    return None
+    _ensure_orders()
+    return _ORDERS[-1] if _ORDERS else None
 
 
 def get_order_by_id(order_id: str) -> Optional[dict]:
     """Get a specific order by ID."""
-    orders = load_orders()
-    for order in orders:
-        if order["id"] == order_id:
-            return order
-    return None
\ No newline at end of file
+    _ensure_orders()
+    return _ORDERS_BY_ID.get(order_id)
\ No newline at end of file
@@ -1,6 +1,7 @@
 import logging
 import os
 import sys
+from datetime import datetime
 from typing import Optional
 
 from dotenv import load_dotenv
@@ -14,24 +15,36 @@ from livekit.agents import (
     WorkerOptions,
     cli,
     metrics,
-    tokenize,
     function_tool,
     RunContext
 )
-from livekit.plugins import murf, silero, google, deepgram, noise_cancellation
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
+from _shared import build_pipeline, get_noise_cancellation
+
 # Add day9_data directory to path to import catalog
 day9_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "day9_data")
 if day9_path not in sys.path:
     sys.path.insert(0, day9_path)
 
-print(f"Looking for catalog.py in: {day9_path}")
-print(f"Files in day9_data: {os.listdir(day9_path) if os.path.exists(day9_path) else 'Directory not found'}")
+# Import diagnostics cost a stat and a directory listing per worker start,
+# so they only run when asked for
+if os.environ.get("DEBUG_CATALOG_IMPORT"):
+    print(f"Looking for catalog.py in: {day9_path}")
+    print(f"Files in day9_data: {os.listdir(day9_path) if os.path.exists(day9_path) else 'Directory not found'}")
 
 try:
-    from catalog import list_products, create_order, get_last_order, get_product_by_name
-    print("✓ Successfully imported catalog functions")
+    from catalog import (
+        catalog_version,
+        create_order,
+        flush_orders,
+        get_last_order,
+        get_product_by_name,
+        list_products,
+        preload,
+    )
+    if os.environ.get("DEBUG_CATALOG_IMPORT"):
+        print("✓ Successfully imported catalog functions")
 except ImportError as e:
     print(f"✗ Failed to import catalog: {e}")
     raise
@@ -40,16 +53,54 @@ logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
 
-
-class ShoppingAssistant(Agent):
-    def __init__(self):
-        self.conversation_context = {
-            "last_products_shown": [],
-            "current_category": None
-        }
-        self.cart = []  # Shopping cart: list of {product_id, product_name, quantity, size, price}
-        super().__init__(
-            instructions="""
+# Rendered browse_catalog replies keyed by (catalog version, filters), so a
+# repeated query skips formatting; list_products memoizes the filtering
+_BROWSE_CACHE: dict[tuple, str] = {}
+_BROWSE_CACHE_MAX = 256
+
+
+def _local_date(created_at: str) -> str:
+    """Calendar date of an order timestamp in this machine's local time zone.
+
+    Orders are stamped in UTC, so an order placed just after local midnight
+    would otherwise be read back as the previous day. Older entries without an
+    offset were written in local time already, which astimezone() assumes.
+    """
+    try:
+        return datetime.fromisoformat(created_at).astimezone().date().isoformat()
+    except ValueError:
+        return created_at[:10]
+
+
+def _normalize_size(size: Optional[str]) -> Optional[str]:
+    """Cart key form of a spoken size: "l " and "L" are the same line, "" is no size."""
+    return size.strip().upper() if size and size.strip() else None
+
+
+def _format_products(products: list[dict], num_to_show: int) -> str:
+    """Render the first num_to_show products as a voice-friendly list."""
+    count = len(products)
+    head, tail_count = products[:num_to_show], count - num_to_show
+    parts = [f"I found {count} product{'s' if count != 1 else ''}:\n"]
+    for i, product in enumerate(head, 1):
+        parts.append(f"{i}. {product['name']}")
+        parts.append(f"   Price: ₹{product['price']}")
+        parts.append(f"   {product['description']}")
+        if product.get('color'):
+            parts.append(f"   Color: {product['color']}")
+        if product['category'] in ['tshirt', 'hoodie'] and 'attributes' in product:
+            if 'sizes' in product['attributes']:
+                parts.append(f"   Sizes: {', '.join(product['attributes']['sizes'])}")
+        parts.append("")
+
+    if tail_count > 0:
+        parts.append(f"\nI have {tail_count} more options. Would you like to hear about them?")
+    else:
+        parts.append("")
+    return "\n".join(parts)
+
+
+_SHOPPING_INSTRUCTIONS = """
 You are a friendly voice shopping assistant for Amazon online store.
 Your job is to help customers browse products, manage their cart, and place orders.
 
@@ -85,6 +136,7 @@ CRITICAL RULES FOR BROWSING:
 
 5. SHOPPING CART WORKFLOW:
    - When user says "add to cart", "I'll take that", "add the first one": Use add_to_cart tool
+   - When user names several products in one go: call add_items_to_cart ONCE with all of them, NOT add_to_cart once per product
    - When user says "remove from cart", "delete that item": Use remove_from_cart tool
    - When user says "show my cart", "what's in my cart": Use show_cart tool
    - When user says "place order", "confirm order", "checkout": Use place_order tool
@@ -113,8 +165,20 @@ CRITICAL RULES FOR BROWSING:
 
 Available categories: mug, tshirt, hoodie, bottle, cap
 Prices are in Indian Rupees (INR).
-""",
-        )
+"""
+
+
+class ShoppingAssistant(Agent):
+    def __init__(self):
+        self.conversation_context = {
+            "last_products_shown": [],
+            "current_category": None
+        }
+        # Shopping cart: (product_id, size or None) -> {product_id, product_name, quantity, size, price}
+        self.cart = {}
+        # Running price x quantity sum over the cart, kept in step with every change
+        self._cart_total = 0
+        super().__init__(instructions=_SHOPPING_INSTRUCTIONS)
 
     @function_tool
     async def browse_catalog(
@@ -139,8 +203,10 @@ Prices are in Indian Rupees (INR).
             col = color if color and color.strip() else None
             kw = keyword if keyword and keyword.strip() else None
             
-            logger.info(f"Browsing catalog with filters - category: {cat}, max_price: {price}, color: {col}, keyword: {kw}")
+            logger.info("Browsing catalog with filters - category: %s, max_price: %s, color: %s, keyword: %s", cat, price, col, kw)
             
+            key = (catalog_version(), cat and cat.lower(), price, col and col.lower(), kw and kw.lower())
+            # A fresh list on every call, so the context never shares a cached one
             products = list_products(
                 category=cat,
                 max_price=price,
@@ -153,40 +219,45 @@ Prices are in Indian Rupees (INR).
             if category:
                 self.conversation_context["current_category"] = category
             
-            logger.info(f"Found {len(products)} products")
+            logger.info("Found %s products", len(products))
             
             if not products:
                 return "I couldn't find any products matching those criteria. Would you like to try different filters or browse another category?"
             
-            # Format product list for voice response
-            if len(products) == 0:
-                return "I couldn't find any products matching those criteria. Would you like to try different filters or browse another category?"
-            
-            response = f"I found {len(products)} product{'s' if len(products) != 1 else ''}:\n\n"
-            
             # Show first 3-5 products with clear numbering and details
             num_to_show = min(len(products), 5)
-            for i, product in enumerate(products[:num_to_show], 1):
-                response += f"{i}. {product['name']}\n"
-                response += f"   Price: ₹{product['price']}\n"
-                response += f"   {product['description']}\n"
-                if product.get('color'):
-                    response += f"   Color: {product['color']}\n"
-                if product['category'] in ['tshirt', 'hoodie'] and 'attributes' in product:
-                    if 'sizes' in product['attributes']:
-                        response += f"   Sizes: {', '.join(product['attributes']['sizes'])}\n"
-                response += "\n"
-            
-            if len(products) > num_to_show:
-                response += f"\nI have {len(products) - num_to_show} more options. Would you like to hear about them?"
-            
-            logger.info(f"Formatted response with {num_to_show} products")
+            response = _BROWSE_CACHE.get(key)
+            if response is None:
+                response = _format_products(products, num_to_show)
+                if len(_BROWSE_CACHE) >= _BROWSE_CACHE_MAX:
+                    # Evict the oldest entry
+                    _BROWSE_CACHE.pop(next(iter(_BROWSE_CACHE), None), None)
+                _BROWSE_CACHE[key] = response
+            
+            logger.info("Formatted response with %s products", num_to_show)
             return response
             
         except Exception as e:
-            logger.error(f"Error browsing catalog: {e}", exc_info=True)
+            logger.error("Error browsing catalog: %s", e, exc_info=True)
             return "Sorry, I had trouble accessing the catalog. Please try again."
 
+    def _add_line(self, product: dict, quantity: int, size: Optional[str]) -> None:
+        """Add to cart, merging with an existing line for the same product and size."""
+        self._cart_total += product['price'] * quantity
+        cart_item = self.cart.get((product['id'], size))
+        if cart_item:
+            cart_item["quantity"] += quantity
+            return
+        cart_item = {
+            "product_id": product['id'],
+            "product_name": product['name'],
+            "quantity": quantity,
+            "price": product['price']
+        }
+        if size:
+            cart_item["size"] = size
+        self.cart[(product['id'], size)] = cart_item
+
     @function_tool
     async def add_to_cart(
         self,
@@ -195,49 +266,75 @@ Prices are in Indian Rupees (INR).
         size: str
     ):
         try:
-            logger.info(f"Adding to cart - product_name: {product_name}, quantity: {quantity}, size: {size}")
-            product = None
-            product_id = None
-            
-            # Case 1: Direct product ID
-            
+            logger.info("Adding to cart - product_name: %s, quantity: %s, size: %s", product_name, quantity, size)
             product = get_product_by_name(product_name)
-            product_id = product['id']
-            
             if not product:
-                logger.warning(f"Could not resolve product name: {product_name}")
+                logger.warning("Could not resolve product name: %s", product_name)
                 return "I'm not sure which product you mean. Could you specify which one by saying 'the first one', 'the second one', or the product name?"
         
-            logger.info(f"Resolved to product: {product['name']} (ID: {product_id})")
+            logger.info("Resolved to product: %s (ID: %s)", product['name'], product['id'])
             
-            # Create cart item
-            cart_item = {
-                "product_id": product_id,
-                "product_name": product['name'],
-                "quantity": quantity if quantity > 0 else 1,
-                "price": product['price']
-            }
-            if size and size.strip():
-                cart_item["size"] = size
-            
-            # Add to cart
-            self.cart.append(cart_item)
+            quantity = quantity if quantity > 0 else 1
+            size = _normalize_size(size)
+            self._add_line(product, quantity, size)
             
             # Format confirmation
-            response = f"Great! I've added {cart_item['quantity']} x {product['name']} "
-            if size and size.strip():
+            response = f"Great! I've added {quantity} x {product['name']} "
+            if size:
                 response += f"(size {size}) "
-            response += f"to your cart for ₹{product['price'] * cart_item['quantity']}. "
+            response += f"to your cart for ₹{product['price'] * quantity}. "
             response += f"Your cart now has {len(self.cart)} item{'s' if len(self.cart) != 1 else ''}. "
             response += "Would you like to continue shopping or view your cart?"
             
-            logger.info(f"Added to cart. Cart now has {len(self.cart)} items")
+            logger.info("Added to cart. Cart now has %s items", len(self.cart))
             return response
             
         except Exception as e:
-            logger.error(f"Error adding to cart: {e}", exc_info=True)
+            logger.error("Error adding to cart: %s", e, exc_info=True)
             return "I'm sorry, there was an issue adding that to your cart. Could you try again?"
 
+    @function_tool
+    async def add_items_to_cart(
+        self,
+        product_names: list[str],
+        quantities: list[int],
+        sizes: list[str]
+    ):
+        """Add several products to the cart in one call. Use this whenever the user names more than one product at once.
+
+        Args:
+            product_names: The product names, e.g. ["Black Pullover Hoodie", "Classic White Mug"]
+            quantities: The quantity of each product, in the same order as product_names
+            sizes: The size of each product in the same order, or "" where no size applies
+        """
+        try:
+            logger.info("Adding %s products to cart: %s", len(product_names), product_names)
+            added = []
+            missing = []
+            for i, product_name in enumerate(product_names):
+                product = get_product_by_name(product_name)
+                if not product:
+                    missing.append(product_name)
+                    continue
+                quantity = quantities[i] if i < len(quantities) and quantities[i] > 0 else 1
+                size = _normalize_size(sizes[i]) if i < len(sizes) else None
+                self._add_line(product, quantity, size)
+                added.append(f"{quantity} x {product['name']}" + (f" (size {size})" if size else ""))
+
+            parts = []
+            if added:
+                parts.append(f"Great! I've added {', '.join(added)} to your cart. Cart total: ₹{self._cart_total}.")
+            if missing:
+                parts.append(f"I couldn't find {', '.join(missing)} in our catalog.")
+            parts.append("Would you like to continue shopping or view your cart?")
+
+            logger.info("Added %s products to cart. Cart now has %s items", len(added), len(self.cart))
+            return " ".join(parts)
+
+        except Exception as e:
+            logger.error("Error adding to cart: %s", e, exc_info=True)
+            return "I'm sorry, there was an issue adding those to your cart. Could you try again?"
+
     @function_tool
     async def remove_from_cart(
         self,
@@ -245,17 +342,22 @@ Prices are in Indian Rupees (INR).
         size: str 
     ):
         try:
-            logger.info(f"Removing from cart - product_name: {product_name}, size: {size}")
+            logger.info("Removing from cart - product_name: %s, size: %s", product_name, size)
             
             if not self.cart:
                 return "Your cart is empty. There's nothing to remove."
             
-            removed_item = None
-            for idx, item in enumerate(self.cart):
-                if item["product_name"] == product_name:
-                    if size and item["size"] and item["size"] == size:
-                        removed_item = self.cart.pop(idx)
-                        break
+            product = get_product_by_name(product_name)
+            if not product:
+                return f"I couldn't find {product_name} in your cart."
+            # Cart lines without a size are keyed with None
+            size = _normalize_size(size)
+            removed_item = self.cart.pop((product['id'], size), None)
+            if not removed_item:
+                if size:
+                    return f"I couldn't find {product['name']} (size {size}) in your cart."
+                return f"I couldn't find {product['name']} in your cart."
+            self._cart_total -= removed_item['price'] * removed_item['quantity']
             
             response = f"I've removed {removed_item['product_name']} from your cart. "
             if self.cart:
@@ -263,11 +365,11 @@ Prices are in Indian Rupees (INR).
             else:
                 response += "Your cart is now empty."
             
-            logger.info(f"Removed item from cart. Cart now has {len(self.cart)} items")
+            logger.info("Removed item from cart. Cart now has %s items", len(self.cart))
             return response
             
         except Exception as e:
-            logger.error(f"Error removing from cart: {e}", exc_info=True)
+            logger.error("Error removing from cart: %s", e, exc_info=True)
             return "I'm sorry, there was an issue removing that item. Could you try again?"
 
 
@@ -275,30 +377,27 @@ Prices are in Indian Rupees (INR).
     async def show_cart(self):
         """Show the current contents of the shopping cart."""
         try:
-            logger.info(f"Showing cart with {len(self.cart)} items")
+            logger.info("Showing cart with %s items", len(self.cart))
             
             if not self.cart:
                 return "Your cart is empty. Browse our products and add items to get started!"
             
-            response = f"Your cart has {len(self.cart)} item{'s' if len(self.cart) != 1 else ''}:\n\n"
+            parts = [f"Your cart has {len(self.cart)} item{'s' if len(self.cart) != 1 else ''}:\n\n"]
             
-            total = 0
-            for i, item in enumerate(self.cart, 1):
+            for i, item in enumerate(self.cart.values(), 1):
                 item_total = item['price'] * item['quantity']
-                total += item_total
-                
-                response += f"{i}. {item['quantity']} x {item['product_name']}"
+                parts.append(f"{i}. {item['quantity']} x {item['product_name']}")
                 if 'size' in item:
-                    response += f" (size {item['size']})"
-                response += f" - ₹{item_total}\n"
+                    parts.append(f" (size {item['size']})")
+                parts.append(f" - ₹{item_total}\n")
             
-            response += f"\nCart Total: ₹{total}\n\n"
-            response += "Would you like to place your order or continue shopping?"
+            parts.append(f"\nCart Total: ₹{self._cart_total}\n\n")
+            parts.append("Would you like to place your order or continue shopping?")
             
-            return response
+            return "".join(parts)
             
         except Exception as e:
-            logger.error(f"Error showing cart: {e}", exc_info=True)
+            logger.error("Error showing cart: %s", e, exc_info=True)
             return "I'm sorry, I couldn't retrieve your cart right now."
 
 
@@ -306,14 +405,14 @@ Prices are in Indian Rupees (INR).
     async def place_order(self):
         """Place an order with all items currently in the cart. Only call this when user explicitly confirms they want to place/checkout the order."""
         try:
-            logger.info(f"Placing order with {len(self.cart)} items")
+            logger.info("Placing order with %s items", len(self.cart))
             
             if not self.cart:
                 return "Your cart is empty. Please add some items before placing an order."
             
             # Build line items from cart
             line_items = []
-            for cart_item in self.cart:
+            for cart_item in self.cart.values():
                 line_item = {
                     "product_name": cart_item['product_name'],
                     "quantity": cart_item['quantity']
@@ -322,30 +421,31 @@ Prices are in Indian Rupees (INR).
                     line_item['size'] = cart_item['size']
                 line_items.append(line_item)
             
-            # Create order
-            order = create_order(line_items)
+            # Create order; resolves once its batch is written to the order log
+            order = await create_order(line_items)
             
             # Format confirmation
-            response = f"Excellent! Your order has been placed successfully. Order ID: {order['id']}.\n\n"
-            response += "Order Summary:\n"
+            parts = [f"Excellent! Your order has been placed successfully. Order ID: {order['id']}.\n\n", "Order Summary:\n"]
             for item in order['items']:
-                response += f"- {item['quantity']} x {item['product_name']}"
+                parts.append(f"- {item['quantity']} x {item['product_name']}")
                 if 'size' in item:
-                    response += f" (size {item['size']})"
-                response += f" - ₹{item['item_total']}\n"
+                    parts.append(f" (size {item['size']})")
+                parts.append(f" - ₹{item['item_total']}\n")
             
-            response += f"\nTotal Amount: ₹{order['total']}\n"
-            response += f"Status: {order['status'].title()}\n\n"
-            response += "Thank you for your order! Is there anything else I can help you with?"
+            parts.append(f"\nTotal Amount: ₹{order['total']}\n")
+            parts.append(f"Status: {order['status'].title()}\n\n")
+            parts.append("Thank you for your order! Is there anything else I can help you with?")
+            response = "".join(parts)
             
             # Clear cart after successful order
-            self.cart = []
-            logger.info(f"Order placed successfully: {order['id']}. Cart cleared.")
+            self.cart = {}
+            self._cart_total = 0
+            logger.info("Order placed successfully: %s. Cart cleared.", order['id'])
             
             return response
             
         except Exception as e:
-            logger.error(f"Error placing order: {e}", exc_info=True)
+            logger.error("Error placing order: %s", e, exc_info=True)
             return "I'm sorry, there was an issue placing your order. Your cart is still saved. Please try again."
 
     @function_tool
@@ -358,29 +458,31 @@ Prices are in Indian Rupees (INR).
                 return "You haven't placed any orders yet. Would you like to browse our catalog?"
             
             # Format order summary
-            response = f"Your last order, Order ID {order['id']}, was placed on {order['created_at'][:10]}. "
-            response += "You ordered: "
+            parts = [f"Your last order, Order ID {order['id']}, was placed on {_local_date(order['created_at'])}. ", "You ordered: "]
             
             for i, item in enumerate(order['items']):
                 if i > 0:
-                    response += "and "
-                response += f"{item['quantity']} {item['product_name']} "
+                    parts.append("and ")
+                parts.append(f"{item['quantity']} {item['product_name']} ")
                 if 'size' in item:
-                    response += f"in size {item['size']} "
-                response += f"for {item['item_total']} rupees, "
+                    parts.append(f"in size {item['size']} ")
+                parts.append(f"for {item['item_total']} rupees, ")
             
-            response += f"Total amount: {order['total']} rupees. Status: {order['status']}."
+            parts.append(f"Total amount: {order['total']} rupees. Status: {order['status']}.")
+            response = "".join(parts)
             
-            logger.info(f"Viewed order: {order['id']}")
+            logger.info("Viewed order: %s", order['id'])
             return response
             
         except Exception as e:
-            logger.error(f"Error viewing order: {e}", exc_info=True)
+            logger.error("Error viewing order: %s", e, exc_info=True)
             return "Sorry, I couldn't retrieve your order information right now."
 
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    build_pipeline(proc)
+    # Build the catalog index before the first browse_catalog call needs it
+    preload()
 
 
 async def entrypoint(ctx: JobContext):
@@ -391,14 +493,9 @@ async def entrypoint(ctx: JobContext):
 
     # Set up voice AI pipeline
     session = AgentSession(
-        stt=deepgram.STT(model="nova-3"),
-        llm=google.LLM(model="gemini-2.5-flash"),
-        tts=murf.TTS(
-            voice="en-US-matthew", 
-            style="Conversation",
-            tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
-            text_pacing=True
-        ),
+        stt=ctx.proc.userdata["stt"],
+        llm=ctx.proc.userdata["llm"],
+        tts=ctx.proc.userdata["tts"],
         turn_detection=MultilingualModel(),
         vad=ctx.proc.userdata["vad"],
         preemptive_generation=True,
@@ -414,16 +511,17 @@ async def entrypoint(ctx: JobContext):
 
     async def log_usage():
         summary = usage_collector.get_summary()
-        logger.info(f"Usage: {summary}")
+        logger.info("Usage: %s", summary)
 
     ctx.add_shutdown_callback(log_usage)
+    ctx.add_shutdown_callback(flush_orders)
 
     # Start the session
     await session.start(
         agent=ShoppingAssistant(),
         room=ctx.room,
         room_input_options=RoomInputOptions(
-            noise_cancellation=noise_cancellation.BVC(),
+            noise_cancellation=get_noise_cancellation(),
         ),
     )
 
@@ -1,5 +1,7 @@
+import asyncio
 import logging
 import json
+import re
 from datetime import datetime
 
 from dotenv import load_dotenv
@@ -13,40 +15,81 @@ from livekit.agents import (
     WorkerOptions,
     cli,
     metrics,
-    tokenize,
 )
-from livekit.plugins import murf, silero, google, deepgram, noise_cancellation
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 from livekit.agents import function_tool, RunContext
 
+from _shared import build_pipeline, get_noise_cancellation, write_json
+
 logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
 
 
-class Assistant(Agent):
-    def __init__(self):
-        # Load catalog
-        with open("shared-data/catalog.json", "r") as f:
-            self.catalog = json.load(f)
-        
-        # Initialize cart
-        self.cart = []
-        
-        super().__init__(
-            instructions="""
+# Seconds to wait before each retry of a failed order write
+_ORDER_RETRY_DELAYS = (1, 2.5, 6.5, 12.5, 18.5)
+
+
+async def _order_writer(queue: asyncio.Queue) -> None:
+    """Persist queued orders in the background, retrying failed writes.
+
+    Orders are queued as "received" and flipped to "placed" once written.
+    """
+    while True:
+        order = await queue.get()
+        try:
+            for delay in (0, *_ORDER_RETRY_DELAYS):
+                await asyncio.sleep(delay)
+                try:
+                    await asyncio.to_thread(
+                        write_json, "current_order.json", {**order, "status": "placed"}, indent=2
+                    )
+                except Exception as e:
+                    logger.warning("Saving order %s failed, will retry: %s", order['order_id'], e)
+                    continue
+                order["status"] = "placed"
+                logger.info("Order placed successfully: %s", order['order_id'])
+                break
+            else:
+                logger.error("Giving up on saving order %s", order['order_id'])
+        finally:
+            queue.task_done()
+
+
+# Words only, so "pasta?" and "Pasta." tokenize like "pasta"
+_WORD_RE = re.compile(r"\w+")
+
+
+def _index_catalog(catalog: dict) -> tuple[dict, dict, dict, list]:
+    """Build the lowercase-name and id lookups over the catalog items, and the
+    lowercase-name and word-set lookups over the recipes.
+
+    The word-set lookup is a list of (words, name, item_ids) sorted by name, so
+    ties between equally good recipes always resolve the same way.
+    """
+    name_index = {}
+    items_by_id = {}
+    for items in catalog["categories"].values():
+        for item in items:
+            items_by_id[item["id"]] = item
+            name_index[item["name"].lower()] = item
+    recipe_index = {name.lower(): item_ids for name, item_ids in catalog["recipes"].items()}
+    recipe_tokens = sorted(
+        ((frozenset(_WORD_RE.findall(name)), name, item_ids) for name, item_ids in recipe_index.items()),
+        key=lambda entry: entry[1],
+    )
+    return name_index, items_by_id, recipe_index, recipe_tokens
+
+
+_INSTRUCTIONS_TEMPLATE = """
         You are a friendly grocery shopping assistant for Blinkit, India's quick commerce platform.
         Your job is to help customers order groceries and food items through voice.
 
         AVAILABLE ITEMS:
-        - Vegetables: Tomatoes, Onions, Potatoes, Capsicum
-        - Dairy: Milk (Amul), Butter (Amul), Cheese Slices (Britannia), Yogurt (Mother Dairy)
-        - Pantry: Pasta (Del Monte), Pasta Sauce (Kissan), Bread (Britannia), Peanut Butter (Sundrop), Rice (India Gate)
-        - Snacks: Potato Chips (Lays), Chocolate Bar (Dairy Milk), Cookies (Parle-G)
-        - Beverages: Coffee Powder (Nescafe), Tea (Tata Tea), Soft Drink (Coca Cola)
+{available_items}
 
         CAPABILITIES:
-        1. Add items to cart with quantities (e.g., "2 kg tomatoes")
+        1. Add items to cart with quantities (e.g., "2 kg tomatoes"), several at once if asked
         2. Handle ingredient requests (e.g., "I need ingredients for pasta" → adds pasta, sauce, tomatoes, capsicum)
         3. Show current cart when asked
         4. Remove items from cart
@@ -57,6 +100,7 @@ class Assistant(Agent):
         2. For each item request:
            - Confirm the item and quantity
            - Use add_to_cart tool
+           - When the user names multiple items in one utterance, call add_items_to_cart once with all of them, NOT add_to_cart per item
         3. For ingredient requests ("ingredients for pasta", "what I need for tea"):
            - Use add_ingredients tool to add multiple items at once
         4. When user asks "what's in my cart?" or "show my cart":
@@ -67,17 +111,76 @@ class Assistant(Agent):
            - Use place_order tool to save the final order
         7. Keep responses natural and conversational
         8. Always confirm actions taken
-        """,
+        """
+
+
+def _render_instructions(catalog: dict) -> str:
+    """Fill the AVAILABLE ITEMS block of the prompt from the catalog."""
+    available_items = "\n".join(
+        f"        - {category.title()}: "
+        + ", ".join(
+            f"{item['name']} ({item['brand']})" if item.get("brand") else item["name"]
+            for item in items
         )
+        for category, items in catalog["categories"].items()
+    )
+    return _INSTRUCTIONS_TEMPLATE.format(available_items=available_items)
+
+
+class Assistant(Agent):
+    def __init__(
+        self,
+        order_queue: asyncio.Queue,
+        catalog: dict,
+        name_index: dict,
+        items_by_id: dict,
+        recipe_index: dict,
+        recipe_tokens: list,
+        instructions: str,
+    ):
+        # Placed orders are handed to the background writer through this queue
+        self._order_queue = order_queue
+
+        # Catalog and its lookup indexes, parsed once per process in prewarm
+        self.catalog = catalog
+        self._name_index = name_index
+        self._items_by_id = items_by_id
+        self._recipe_index = recipe_index
+        self._recipe_tokens = recipe_tokens
+        
+        # Initialize cart, keyed by item id in the order items were added
+        self.cart = {}
+        # Running price x quantity sum over the cart, kept in step with every change
+        self._cart_total = 0
+        
+        super().__init__(instructions=instructions)
 
     def _find_item(self, item_name: str):
         """Find item in catalog by name (case-insensitive)"""
         item_name_lower = item_name.lower()
-        for category, items in self.catalog["categories"].items():
-            for item in items:
-                if item_name_lower in item["name"].lower():
-                    return item
-        return None
+        item = self._name_index.get(item_name_lower)
+        if item:
+            return item
+        return next(
+            (item for name, item in self._name_index.items() if item_name_lower in name),
+            None,
+        )
+
+    def _add_item(self, item: dict, quantity: float) -> dict:
+        """Add a quantity of a catalog item to the cart and return its cart line."""
+        self._cart_total += item["price"] * quantity
+        cart_item = self.cart.get(item["id"])
+        if cart_item:
+            cart_item["quantity"] += quantity
+        else:
+            cart_item = self.cart[item["id"]] = {
+                "id": item["id"],
+                "name": item["name"],
+                "price": item["price"],
+                "unit": item["unit"],
+                "quantity": quantity
+            }
+        return cart_item
 
     @function_tool
     async def add_to_cart(
@@ -96,22 +199,49 @@ class Assistant(Agent):
             return f"Sorry, I couldn't find '{item_name}' in our catalog. Could you try another item?"
         
         # Check if item already in cart
-        for cart_item in self.cart:
-            if cart_item["id"] == item["id"]:
-                cart_item["quantity"] += quantity
-                return f"Great! I've added {quantity} {item['unit']} of {item['name']} to your cart. You now have {cart_item['quantity']} {item['unit']} total."
+        if item["id"] in self.cart:
+            cart_item = self._add_item(item, quantity)
+            return f"Great! I've added {quantity} {item['unit']} of {item['name']} to your cart. You now have {cart_item['quantity']} {item['unit']} total."
         
         # Add new item
-        self.cart.append({
-            "id": item["id"],
-            "name": item["name"],
-            "price": item["price"],
-            "unit": item["unit"],
-            "quantity": quantity
-        })
+        self._add_item(item, quantity)
         
         return f"Added {quantity} {item['unit']} of {item['name']} (₹{item['price']}/{item['unit']}) to your cart!"
 
+    @function_tool
+    async def add_items_to_cart(
+        self,
+        item_names: list[str],
+        quantities: list[float]
+    ):
+        """Add several items to the cart in one call. Use this whenever the user names more than one item at once.
+        
+        Args:
+            item_names: The names of the items (e.g., ["tomatoes", "milk", "bread"])
+            quantities: The quantity of each item, in the same order (e.g., [2, 1, 1])
+        """
+        added = []
+        missing = []
+        for i, item_name in enumerate(item_names):
+            item = self._find_item(item_name)
+            if not item:
+                missing.append(item_name)
+                continue
+            quantity = quantities[i] if i < len(quantities) and quantities[i] > 0 else 1
+            self._add_item(item, quantity)
+            added.append(f"{quantity} {item['unit']} of {item['name']}")
+        
+        if not added and not missing:
+            return "I didn't catch which items to add. What would you like?"
+        
+        parts = []
+        if added:
+            parts.append(f"Added {', '.join(added)} to your cart. Cart total: ₹{self._cart_total}.")
+        if missing:
+            parts.append(f"Sorry, I couldn't find {', '.join(missing)} in our catalog.")
+        parts.append("Anything else?")
+        return " ".join(parts)
+
     @function_tool
     async def add_ingredients(
         self, 
@@ -125,48 +255,30 @@ class Assistant(Agent):
         """
         dish_lower = dish_name.lower()
         
-        # Find matching recipe
-        recipe_items = None
-        for recipe_name, item_ids in self.catalog["recipes"].items():
-            if recipe_name in dish_lower or dish_lower in recipe_name:
-                recipe_items = item_ids
-                break
+        # Find matching recipe: exact name first, then a recipe whose words all
+        # appear in the request ("ingredients for pasta") or that contains all
+        # of the request's words ("peanut butter"). One shared word is not
+        # enough: "bread and butter" must not become a peanut butter sandwich.
+        recipe_items = self._recipe_index.get(dish_lower)
+        if recipe_items is None:
+            tokens = frozenset(_WORD_RE.findall(dish_lower))
+            best_overlap = 0
+            for recipe_words, _, item_ids in self._recipe_tokens:
+                overlap = len(recipe_words & tokens)
+                # Strictly greater keeps the alphabetically first recipe on ties
+                if overlap > best_overlap and (recipe_words <= tokens or tokens <= recipe_words):
+                    best_overlap, recipe_items = overlap, item_ids
         
         if not recipe_items:
             return f"I don't have a recipe for '{dish_name}' in my system. Would you like to add specific items instead?"
         
         added_items = []
         for item_id in recipe_items:
-            # Find item in catalog
-            item = None
-            for category, items in self.catalog["categories"].items():
-                for cat_item in items:
-                    if cat_item["id"] == item_id:
-                        item = cat_item
-                        break
-                if item:
-                    break
+            item = self._items_by_id.get(item_id)
             
             if item:
                 # Add to cart (quantity 1 for each ingredient)
-                cart_item = {
-                    "id": item["id"],
-                    "name": item["name"],
-                    "price": item["price"],
-                    "unit": item["unit"],
-                    "quantity": 1
-                }
-                
-                # Check if already in cart
-                found = False
-                for existing in self.cart:
-                    if existing["id"] == item["id"]:
-                        existing["quantity"] += 1
-                        found = True
-                        break
-                
-                if not found:
-                    self.cart.append(cart_item)
+                self._add_item(item, 1)
                 
                 added_items.append(item["name"])
         
@@ -179,16 +291,13 @@ class Assistant(Agent):
         if not self.cart:
             return "Your cart is empty. What would you like to order?"
         
-        cart_summary = "Here's what's in your cart:\n"
-        total = 0
-        
-        for item in self.cart:
+        parts = ["Here's what's in your cart:\n"]
+        for item in self.cart.values():
             item_total = item["price"] * item["quantity"]
-            total += item_total
-            cart_summary += f"- {item['name']}: {item['quantity']} {item['unit']} (₹{item_total})\n"
+            parts.append(f"- {item['name']}: {item['quantity']} {item['unit']} (₹{item_total})\n")
         
-        cart_summary += f"\nTotal: ₹{total}"
-        return cart_summary
+        parts.append(f"\nTotal: ₹{self._cart_total}")
+        return "".join(parts)
 
     @function_tool
     async def remove_from_cart(
@@ -203,50 +312,56 @@ class Assistant(Agent):
         """
         item_name_lower = item_name.lower()
         
-        for i, cart_item in enumerate(self.cart):
+        for item_id, cart_item in self.cart.items():
             if item_name_lower in cart_item["name"].lower():
-                removed_item = self.cart.pop(i)
+                removed_item = self.cart.pop(item_id)
+                self._cart_total -= removed_item["price"] * removed_item["quantity"]
                 return f"I've removed {removed_item['name']} from your cart."
         
         return f"I couldn't find '{item_name}' in your cart."
 
     @function_tool
     async def place_order(self, context: RunContext):
-        """Place the final order and save it to a JSON file."""
+        """Place the final order; it is saved to a JSON file in the background."""
         if not self.cart:
             return "Your cart is empty. Please add some items before placing an order."
         
-        # Calculate total
-        total = sum(item["price"] * item["quantity"] for item in self.cart)
+        total = self._cart_total
         
-        # Create order object
+        # Create order object; one clock read so the id and timestamp agree
+        now = datetime.now()
         order = {
-            "order_id": f"BLK{datetime.now().strftime('%Y%m%d%H%M%S')}",
-            "timestamp": datetime.now().isoformat(),
-            "items": self.cart,
+            "order_id": f"BLK{now:%Y%m%d%H%M%S}",
+            "timestamp": now.isoformat(),
+            "items": list(self.cart.values()),
             "total": total,
-            "status": "placed"
+            "status": "received"
         }
         
-        try:
-            # Save to JSON file
-            with open("current_order.json", "w") as f:
-                json.dump(order, f, indent=2)
-            
-            logger.info(f"Order placed successfully: {order['order_id']}")
-            
-            # Clear cart
-            self.cart = []
-            
-            return f"Awesome! Your order {order['order_id']} has been placed. Total amount: ₹{total}. Your groceries will be delivered in 10 minutes! Thank you for shopping with Blinkit!"
+        # Hand off to the writer so the user hears the confirmation right away
+        self._order_queue.put_nowait(order)
+        logger.info("Order received: %s", order['order_id'])
         
-        except Exception as e:
-            logger.error(f"Error placing order: {e}")
-            return "I apologize, there was an issue placing your order. Please try again."
+        # Clear cart
+        self.cart = {}
+        self._cart_total = 0
+        
+        return f"Awesome! Your order {order['order_id']} has been placed. Total amount: ₹{total}. Your groceries will be delivered in 10 minutes! Thank you for shopping with Blinkit!"
 
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    build_pipeline(proc)
+    # Parse and index the catalog once, off the session-start path
+    with open("shared-data/catalog.json", "r") as f:
+        catalog = json.load(f)
+    proc.userdata["catalog"] = catalog
+    (
+        proc.userdata["name_index"],
+        proc.userdata["items_by_id"],
+        proc.userdata["recipe_index"],
+        proc.userdata["recipe_tokens"],
+    ) = _index_catalog(catalog)
+    proc.userdata["instructions"] = _render_instructions(catalog)
 
 
 async def entrypoint(ctx: JobContext):
@@ -255,14 +370,9 @@ async def entrypoint(ctx: JobContext):
     }
 
     session = AgentSession(
-        stt=deepgram.STT(model="nova-3"),
-        llm=google.LLM(model="gemini-2.5-flash"),
-        tts=murf.TTS(
-            voice="en-US-matthew", 
-            style="Conversation",
-            tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
-            text_pacing=True
-        ),
+        stt=ctx.proc.userdata["stt"],
+        llm=ctx.proc.userdata["llm"],
+        tts=ctx.proc.userdata["tts"],
         turn_detection=MultilingualModel(),
         vad=ctx.proc.userdata["vad"],
         preemptive_generation=True,
@@ -277,15 +387,33 @@ async def entrypoint(ctx: JobContext):
 
     async def log_usage():
         summary = usage_collector.get_summary()
-        logger.info(f"Usage: {summary}")
+        logger.info("Usage: %s", summary)
 
     ctx.add_shutdown_callback(log_usage)
 
+    # Background order writer; shutdown waits for queued orders to be saved
+    order_queue = asyncio.Queue()
+    order_writer = asyncio.create_task(_order_writer(order_queue))
+
+    async def drain_orders():
+        await order_queue.join()
+        order_writer.cancel()
+
+    ctx.add_shutdown_callback(drain_orders)
+
     await session.start(
-        agent=Assistant(),
+        agent=Assistant(
+            order_queue,
+            catalog=ctx.proc.userdata["catalog"],
+            name_index=ctx.proc.userdata["name_index"],
+            items_by_id=ctx.proc.userdata["items_by_id"],
+            recipe_index=ctx.proc.userdata["recipe_index"],
+            recipe_tokens=ctx.proc.userdata["recipe_tokens"],
+            instructions=ctx.proc.userdata["instructions"],
+        ),
         room=ctx.room,
         room_input_options=RoomInputOptions(
-            noise_cancellation=noise_cancellation.BVC(),
+            noise_cancellation=get_noise_cancellation(),
         ),
     )
 
@@ -1,6 +1,11 @@
+import asyncio
+import hmac
 import logging
-import mysql.connector
-from mysql.connector import Error
+import re
+import threading
+import time
+from typing import NamedTuple, Optional
+from mysql.connector import Error, pooling
 import os
 
 from dotenv import load_dotenv
@@ -14,12 +19,13 @@ from livekit.agents import (
     WorkerOptions,
     cli,
     metrics,
-    tokenize,
+    UserInputTranscribedEvent,
 )
-from livekit.plugins import murf, silero, google, deepgram, noise_cancellation
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 from livekit.agents import function_tool, RunContext
 
+from _shared import build_pipeline, get_noise_cancellation
+
 logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
@@ -31,23 +37,142 @@ DB_CONFIG = {
     'database': os.getenv('DB_NAME')
 }
 
-class Assistant(Agent):
-    def __init__(self):
-        self.fraud_case = {
-            "id": None,
-            "userName": None,
-            "securityIdentifier": None,
-            "cardEnding": None,
-            "case": None,
-            "transactionName": None,
-            "transactionTime": None,
-            "transactionCategory": None,
-            "transactionSource": None,
-            "verificationStatus": None,
-            "outcome": None
-        }
-        super().__init__(
-            instructions="""
+# Connections are pooled per process and opened on first use, so tool calls
+# skip the connect/auth handshake and a DB outage doesn't block worker start
+_CNX_POOL = None
+# get_connection() raises PoolError instead of waiting when all are in use
+_POOL_SIZE = 4
+# Worker threads may race to create the pool on first use
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool() -> pooling.MySQLConnectionPool:
+    global _CNX_POOL
+    with _POOL_LOCK:
+        if _CNX_POOL is None:
+            _CNX_POOL = pooling.MySQLConnectionPool(
+                pool_name="fraud",
+                pool_size=_POOL_SIZE,
+                # Queries are plain parametrized statements with no session state
+                pool_reset_session=False,
+                # Each UPDATE is its own transaction; skips the separate COMMIT round trip
+                autocommit=True,
+                # Fail fast instead of hanging a call on an unreachable server
+                connection_timeout=5,
+                **DB_CONFIG,
+            )
+    return _CNX_POOL
+
+
+class FraudCase(NamedTuple):
+    """One fraud_cases row, in SELECT_CASE_SQL column order."""
+    id: Optional[int] = None
+    userName: Optional[str] = None
+    securityIdentifier: Optional[str] = None
+    cardEnding: Optional[str] = None
+    case: Optional[str] = None
+    transactionName: Optional[str] = None
+    transactionTime: Optional[str] = None
+    transactionCategory: Optional[str] = None
+    transactionSource: Optional[str] = None
+    verificationStatus: Optional[str] = None
+    outcome: Optional[str] = None
+
+
+# Recently loaded case rows keyed by lowercased name, so a repeated
+# load_fraud_case (retries, clarifications) skips the database
+_CASE_CACHE: dict[str, tuple[float, FraudCase]] = {}
+_CASE_CACHE_TTL = 60.0
+_CASE_CACHE_MAX = 1024
+
+
+def _cached_case(key: str):
+    entry = _CASE_CACHE.get(key)
+    if entry and time.monotonic() - entry[0] < _CASE_CACHE_TTL:
+        return entry[1]
+    return None
+
+
+def _cache_case(key: str, row: FraudCase) -> None:
+    if len(_CASE_CACHE) >= _CASE_CACHE_MAX:
+        _CASE_CACHE.clear()
+    _CASE_CACHE[key] = (time.monotonic(), row)
+
+
+def _forget_case(case_id) -> None:
+    """Drop cached rows for a case once it is no longer pending review."""
+    for key in [k for k, (_, row) in _CASE_CACHE.items() if row.id == case_id]:
+        del _CASE_CACHE[key]
+
+
+# Served by idx_user_status (sql/fraud_cases_index.sql)
+SELECT_CASE_SQL = '''
+    SELECT id, userName, securityIdentifier, cardEnding, case_status, 
+           transactionName, transactionTime, transactionCategory, 
+           transactionSource, verificationStatus, outcome
+    FROM fraud_cases
+    WHERE userName = %s AND case_status = 'pending_review'
+    LIMIT 1
+'''
+
+UPDATE_CASE_SQL = '''
+    UPDATE fraud_cases
+    SET case_status = %s,
+        verificationStatus = 'verified',
+        outcome = %s
+    WHERE id = %s
+'''
+
+
+# The driver is blocking, so these run in a worker thread via asyncio.to_thread
+# to keep the event loop free for audio
+def _fetch_case(user_name: str):
+    conn = _get_pool().get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(SELECT_CASE_SQL, (user_name,))
+        result = cursor.fetchone()
+        
+        cursor.close()
+        return FraudCase._make(result) if result else None
+    finally:
+        # Returns the connection to the pool
+        conn.close()
+
+
+def _update_case(case_id, case_status: str, customer_response: str) -> None:
+    conn = _get_pool().get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(UPDATE_CASE_SQL, (case_status, customer_response, case_id))
+        
+        cursor.close()
+    finally:
+        # Returns the connection to the pool
+        conn.close()
+
+
+# Picks a likely name out of a (possibly partial) transcript, e.g. "my name is John Smith"
+_NAME_RE = re.compile(
+    r"(?i:\b(?:my name is|this is|i am|i'm|name's))\s+([A-Z][\w'-]*(?:\s+[A-Z][\w'-]*)?)"
+)
+_MAX_PREFETCHES = 8
+# Speculative queries may hold at most this many pooled connections at once,
+# leaving one for load_fraud_case itself and one for the pending-case refresh
+_MAX_INFLIGHT_PREFETCHES = _POOL_SIZE - 2
+# Separators customers may say or type inside the security identifier
+_ID_SEPARATORS = str.maketrans("", "", " -")
+# Lookups faster than this finish silently; slower ones get a spoken hold message
+_ACK_DELAY = 0.3
+
+
+async def _ack_after_delay(session: AgentSession) -> None:
+    await asyncio.sleep(_ACK_DELAY)
+    session.say("One moment while I pull up your case.")
+
+
+# Static system prompt, built once at import and shared by every session
+FRAUD_INSTRUCTIONS = """
         You are a professional fraud detection representative for HDFC Bank.
         Your job is to contact customers about suspicious transactions on their account.
 
@@ -83,12 +208,48 @@ class Assistant(Agent):
         - Keep responses clear and concise.
         - ALWAYS verify the Security Identifier using the verify_security_identifier tool before proceeding.
         - Do NOT proceed with transaction verification if security check fails.
-        """,
+        """
+
+
+class Assistant(Agent):
+    def __init__(self):
+        # Speculative case lookups started from the transcript, keyed by lowercased name
+        self._prefetch: dict[str, asyncio.Task] = {}
+        self.fraud_case = FraudCase()
+        super().__init__(
+            instructions=FRAUD_INSTRUCTIONS,
         )
 
+    def prefetch_from_transcript(self, transcript: str) -> None:
+        """Start loading the case for a name heard in the transcript.
+
+        Runs while the user is still talking and the LLM is still deciding to
+        call load_fraud_case, so the row is usually ready when it does.
+        """
+        if self.fraud_case.id or len(self._prefetch) >= _MAX_PREFETCHES:
+            return
+        match = _NAME_RE.search(transcript)
+        if not match:
+            return
+        name = match.group(1)
+        key = name.lower()
+        in_flight = sum(1 for task in self._prefetch.values() if not task.done())
+        if key not in self._prefetch and in_flight < _MAX_INFLIGHT_PREFETCHES:
+            logger.debug("Prefetching fraud case for %s", name)
+            self._prefetch[key] = asyncio.create_task(self._prefetch_case(name))
+
+    async def _prefetch_case(self, user_name: str):
+        try:
+            return await asyncio.to_thread(_fetch_case, user_name)
+        except Error as e:
+            # load_fraud_case queries again and reports the error itself
+            logger.debug("Prefetch for %s failed: %s", user_name, e)
+            return None
+
     @function_tool
     async def load_fraud_case(
         self, 
+        context: RunContext,
         user_name: str
     ):
         """Load the fraud case for the given user name from the database.
@@ -97,40 +258,25 @@ class Assistant(Agent):
             user_name: The customer's name to look up their fraud case
         """
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor()
-            
-            query = '''
-                SELECT id, userName, securityIdentifier, cardEnding, case_status, 
-                       transactionName, transactionTime, transactionCategory, 
-                       transactionSource, verificationStatus, outcome
-                FROM fraud_cases
-                WHERE userName = %s AND case_status = 'pending_review'
-                LIMIT 1
-            '''
-            
-            cursor.execute(query, (user_name,))
-            result = cursor.fetchone()
-            
-            cursor.close()
-            conn.close()
+            key = user_name.strip().lower()
+            result = _cached_case(key)
+            if result is None:
+                # Speak a hold message over the DB wait instead of sitting in silence
+                ack = asyncio.create_task(_ack_after_delay(context.session))
+                try:
+                    prefetched = self._prefetch.pop(key, None)
+                    result = await prefetched if prefetched else None
+                    if result is None:
+                        result = await asyncio.to_thread(_fetch_case, user_name)
+                finally:
+                    ack.cancel()
+                if result:
+                    _cache_case(key, result)
             
             if result:
-                self.fraud_case = {
-                    "id": result[0],
-                    "userName": result[1],
-                    "securityIdentifier": result[2],
-                    "cardEnding": result[3],
-                    "case": result[4],
-                    "transactionName": result[5],
-                    "transactionTime": result[6],
-                    "transactionCategory": result[7],
-                    "transactionSource": result[8],
-                    "verificationStatus": result[9],
-                    "outcome": result[10]
-                }
+                self.fraud_case = result
                 
-                logger.info(f"Loaded fraud case for {user_name}: {self.fraud_case}")
+                logger.info(f"Loaded fraud case {result.id} for {user_name}")
                 return f"Thank you, {user_name}. I've pulled up your account. Before we proceed, I need to verify your identity. Can you please provide your 5-digit Security Identifier?"
             else:
                 logger.warning(f"No fraud case found for {user_name}")
@@ -150,21 +296,22 @@ class Assistant(Agent):
         Args:
             provided_identifier: The 5-digit security identifier provided by the customer
         """
-        if not self.fraud_case["id"]:
+        if not self.fraud_case.id:
             logger.error("Attempted to verify security identifier before loading fraud case")
             return "I need to load your account information first. Can you please provide your name?"
         
         # Convert to string and remove any spaces or dashes
-        provided = str(provided_identifier).replace(" ", "").replace("-", "")
-        expected = str(self.fraud_case["securityIdentifier"]).replace(" ", "").replace("-", "")
+        provided = str(provided_identifier).translate(_ID_SEPARATORS)
+        expected = str(self.fraud_case.securityIdentifier).translate(_ID_SEPARATORS)
         
-        logger.info(f"Verifying security identifier - Provided: {provided}, Expected: {expected}")
+        logger.info(f"Verifying security identifier for user {self.fraud_case.userName}")
         
-        if provided == expected:
-            logger.info(f"Security verification SUCCESS for user {self.fraud_case['userName']}")
-            return f"Thank you, your identity has been verified. Now, regarding the suspicious transaction: We detected a charge from {self.fraud_case['transactionName']} on your card ending in {self.fraud_case['cardEnding']} at {self.fraud_case['transactionTime']}, categorized as {self.fraud_case['transactionCategory']} via {self.fraud_case['transactionSource']}. Did you authorize this transaction?"
+        # Constant-time comparison so response timing doesn't leak the identifier
+        if hmac.compare_digest(provided.encode(), expected.encode()):
+            logger.info(f"Security verification SUCCESS for user {self.fraud_case.userName}")
+            return f"Thank you, your identity has been verified. Now, regarding the suspicious transaction: We detected a charge from {self.fraud_case.transactionName} on your card ending in {self.fraud_case.cardEnding} at {self.fraud_case.transactionTime}, categorized as {self.fraud_case.transactionCategory} via {self.fraud_case.transactionSource}. Did you authorize this transaction?"
         else:
-            logger.warning(f"Security verification FAILED for user {self.fraud_case['userName']} - Provided: {provided}, Expected: {expected}")
+            logger.warning(f"Security verification FAILED for user {self.fraud_case.userName}")
             return "I'm sorry, but the Security Identifier you provided doesn't match our records. For your security, would you like to try again, or would you prefer to call our fraud department directly?"
 
     @function_tool
@@ -174,29 +321,15 @@ class Assistant(Agent):
         customer_response: str
     ):
         try:
-            conn = mysql.connector.connect(**DB_CONFIG)
-            cursor = conn.cursor()
-            
-            update_query = '''
-                UPDATE fraud_cases
-                SET case_status = %s,
-                    verificationStatus = 'verified',
-                    outcome = %s
-                WHERE id = %s
-            '''
-            
-            cursor.execute(update_query, (case_status, customer_response, self.fraud_case["id"]))
-            conn.commit()
+            await asyncio.to_thread(_update_case, self.fraud_case.id, case_status, customer_response)
+            _forget_case(self.fraud_case.id)
             
-            cursor.close()
-            conn.close()
-            
-            logger.info(f"Fraud case updated: ID={self.fraud_case['id']}, Status={case_status}")
+            logger.info(f"Fraud case updated: ID={self.fraud_case.id}, Status={case_status}")
             
             if case_status == "safe":
-                return f"Perfect, {self.fraud_case['userName']}. I've marked this transaction as legitimate. No further action is needed. Your card ending in {self.fraud_case['cardEnding']} remains active. Thank you for confirming, and have a great day!"
+                return f"Perfect, {self.fraud_case.userName}. I've marked this transaction as legitimate. No further action is needed. Your card ending in {self.fraud_case.cardEnding} remains active. Thank you for confirming, and have a great day!"
             else:
-                return f"I understand, {self.fraud_case['userName']}. I've marked this as fraudulent. Your card ending in {self.fraud_case['cardEnding']} has been blocked for your protection, and we'll issue you a new card within 5-7 business days. We'll also open a dispute for this transaction. Is there anything else I can help you with today?"
+                return f"I understand, {self.fraud_case.userName}. I've marked this as fraudulent. Your card ending in {self.fraud_case.cardEnding} has been blocked for your protection, and we'll issue you a new card within 5-7 business days. We'll also open a dispute for this transaction. Is there anything else I can help you with today?"
         
         except Error as e:
             logger.error(f"Error updating fraud case: {e}")
@@ -204,7 +337,7 @@ class Assistant(Agent):
 
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    build_pipeline(proc)
 
 
 async def entrypoint(ctx: JobContext):
@@ -218,20 +351,13 @@ async def entrypoint(ctx: JobContext):
     session = AgentSession(
         # Speech-to-text (STT) is your agent's ears, turning the user's speech into text that the LLM can understand
         # See all available models at https://docs.livekit.io/agents/models/stt/
-        stt=deepgram.STT(model="nova-3"),
+        stt=ctx.proc.userdata["stt"],
         # A Large Language Model (LLM) is your agent's brain, processing user input and generating a response
         # See all available models at https://docs.livekit.io/agents/models/llm/
-        llm=google.LLM(
-                model="gemini-2.5-flash",
-            ),
+        llm=ctx.proc.userdata["llm"],
         # Text-to-speech (TTS) is your agent's voice, turning the LLM's text into speech that the user can hear
         # See all available models as well as voice selections at https://docs.livekit.io/agents/models/tts/
-        tts=murf.TTS(
-                voice="en-US-matthew", 
-                style="Conversation",
-                tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
-                text_pacing=True
-            ),
+        tts=ctx.proc.userdata["tts"],
         # VAD and turn detection are used to determine when the user is speaking and when the agent should respond
         # See more at https://docs.livekit.io/agents/build/turns
         turn_detection=MultilingualModel(),
@@ -266,6 +392,13 @@ async def entrypoint(ctx: JobContext):
 
     ctx.add_shutdown_callback(log_usage)
 
+    agent = Assistant()
+
+    @session.on("user_input_transcribed")
+    def _on_user_input_transcribed(ev: UserInputTranscribedEvent):
+        # Interim transcripts too, so the lookup overlaps with the user speaking
+        agent.prefetch_from_transcript(ev.transcript)
+
     # # Add a virtual avatar to the session, if desired
     # # For other providers, see https://docs.livekit.io/agents/models/avatar/
     # avatar = hedra.AvatarSession(
@@ -276,11 +409,11 @@ async def entrypoint(ctx: JobContext):
 
     # Start the session, which initializes the voice pipeline and warms up the models
     await session.start(
-        agent=Assistant(),
+        agent=agent,
         room=ctx.room,
         room_input_options=RoomInputOptions(
             # For telephony applications, use `BVCTelephony` for best results
-            noise_cancellation=noise_cancellation.BVC(),
+            noise_cancellation=get_noise_cancellation(),
         ),
     )
 
@@ -11,11 +11,11 @@ from livekit.agents import (
     WorkerOptions,
     cli,
     metrics,
-    tokenize,
 )
-from livekit.plugins import murf, silero, google, deepgram, noise_cancellation
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 
+from _shared import build_pipeline, get_noise_cancellation
+
 logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
@@ -91,7 +91,7 @@ Begin the horror adventure now with options.
 
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    build_pipeline(proc)
 
 
 async def entrypoint(ctx: JobContext):
@@ -102,16 +102,9 @@ async def entrypoint(ctx: JobContext):
 
     # Set up voice AI pipeline
     session = AgentSession(
-        stt=deepgram.STT(model="nova-3"),
-        llm=google.LLM(
-            model="gemini-2.5-flash",
-        ),
-        tts=murf.TTS(
-            voice="en-US-matthew", 
-            style="Conversation",
-            tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
-            text_pacing=True
-        ),
+        stt=ctx.proc.userdata["stt"],
+        llm=ctx.proc.userdata["llm"],
+        tts=ctx.proc.userdata["tts"],
         turn_detection=MultilingualModel(),
         vad=ctx.proc.userdata["vad"],
         preemptive_generation=True,
@@ -136,7 +129,7 @@ async def entrypoint(ctx: JobContext):
         agent=GameMaster(),
         room=ctx.room,
         room_input_options=RoomInputOptions(
-            noise_cancellation=noise_cancellation.BVC(),
+            noise_cancellation=get_noise_cancellation(),
         ),
     )
 
@@ -11,15 +11,15 @@ from livekit.agents import (
     WorkerOptions,
     cli,
     metrics,
-    tokenize,
     # function_tool,
     # RunContext
 )
-from livekit.plugins import murf, silero, google, deepgram, noise_cancellation
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 from livekit.agents import function_tool, RunContext
 import json
 
+from _shared import build_pipeline, get_noise_cancellation, get_tts
+
 logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
@@ -109,12 +109,7 @@ If they want to switch modes:
 Keep explanations simple and encouraging!
             """,
             # Override TTS to use Matthew's voice
-            tts=murf.TTS(
-                voice="en-US-matthew",
-                style="Conversation",
-                tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
-                text_pacing=True
-            ),
+            tts=get_tts("en-US-matthew"),
         )
 
     # To add tools, use the @function_tool decorator.
@@ -166,12 +161,7 @@ If they want to switch modes:
 Be supportive and positive!
             """,
             # Override TTS to use Alicia's voice
-            tts=murf.TTS(
-                voice="en-US-alicia",
-                style="Conversation",
-                tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
-                text_pacing=True
-            ),
+            tts=get_tts("en-US-alicia"),
         )
 
     @function_tool
@@ -206,12 +196,7 @@ If they want to switch modes:
 Be encouraging!
             """,
             # Override TTS to use Ken's voice
-            tts=murf.TTS(
-                voice="en-US-ken",
-                style="Conversation",
-                tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
-                text_pacing=True
-            ),
+            tts=get_tts("en-US-ken"),
         )
 
     @function_tool
@@ -226,7 +211,7 @@ Be encouraging!
 
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    build_pipeline(proc)
 
 
 async def entrypoint(ctx: JobContext):
@@ -240,21 +225,14 @@ async def entrypoint(ctx: JobContext):
     session = AgentSession(
         # Speech-to-text (STT) is your agent's ears, turning the user's speech into text that the LLM can understand
         # See all available models at https://docs.livekit.io/agents/models/stt/
-        stt=deepgram.STT(model="nova-3"),
+        stt=ctx.proc.userdata["stt"],
         # A Large Language Model (LLM) is your agent's brain, processing user input and generating a response
         # See all available models at https://docs.livekit.io/agents/models/llm/
-        llm=google.LLM(
-                model="gemini-2.5-flash",
-            ),
+        llm=ctx.proc.userdata["llm"],
         # Text-to-speech (TTS) is your agent's voice, turning the LLM's text into speech that the user can hear
         # See all available models as well as voice selections at https://docs.livekit.io/agents/models/tts/
         # Note: Each agent can override this with their own voice
-        tts=murf.TTS(
-                voice="en-US-matthew", 
-                style="Conversation",
-                tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
-                text_pacing=True
-            ),
+        tts=ctx.proc.userdata["tts"],
         # VAD and turn detection are used to determine when the user is speaking and when the agent should respond
         # See more at https://docs.livekit.io/agents/build/turns
         turn_detection=MultilingualModel(),
@@ -304,7 +282,7 @@ async def entrypoint(ctx: JobContext):
         room=ctx.room,
         room_input_options=RoomInputOptions(
             # For telephony applications, use `BVCTelephony` for best results
-            noise_cancellation=noise_cancellation.BVC(),
+            noise_cancellation=get_noise_cancellation(),
         ),
     )
 
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 
 from dotenv import load_dotenv
@@ -13,41 +14,70 @@ from livekit.agents import (
     WorkerOptions,
     cli,
     metrics,
-    tokenize,
     function_tool,
     RunContext
 )
-from livekit.plugins import murf, silero, google, deepgram, noise_cancellation
 from livekit.plugins.turn_detector.multilingual import MultilingualModel
 import json
+from collections import deque
+
+from _shared import build_pipeline, get_noise_cancellation
 
 logger = logging.getLogger("agent")
 
 load_dotenv(".env.local")
 
-# path
-WELLNESS_LOG_PATH = Path("wellness_log.json")
-class WellnessAssistant(Agent):
-    def __init__(self):
-        # Load previous sessions to provide context
-        self.previous_sessions = self._load_wellness_log()
-        self.current_session = {
-            "date": datetime.now().strftime("%Y-%m-%d"),
-            "time": datetime.now().strftime("%H:%M:%S"),
-            "mood": None,
-            "energy": None,
-            "goals": [],
-            "notes": None
-        }
-        
-        # Build context from previous sessions
-        history_context = self._build_history_context()
-        
-        super().__init__(
-            instructions=f"""
-                You are a supportive daily wellness companion. Your role is to conduct a brief, friendly check-in with the user about their wellbeing and daily intentions.
+# Append-only NDJSON: one check-in per line
+WELLNESS_LOG_PATH = Path("wellness_log.ndjson")
+
+# Parsed recent sessions and the rendered history context, reused by every
+# session until the log file's mtime changes.
+_LOG_CACHE = {"mtime": None, "sessions": [], "context": ""}
+
+
+def _render_history_context(recent: list) -> str:
+    if not recent:
+        return "PREVIOUS SESSIONS: None. This is the user's first check-in."
+
+    lines = ["PREVIOUS SESSIONS (for reference only - mention naturally, don't list):"]
+    for session in recent:
+        lines.append(f"- {session['date']}: Mood: {session['mood']}, Energy: {session['energy']}, Goals: {', '.join(session['goals'])}")
+    return "\n".join(lines) + "\n"
+
+
+def _refresh_log_cache() -> dict:
+    try:
+        mtime = WELLNESS_LOG_PATH.stat().st_mtime
+    except FileNotFoundError:
+        mtime = 0.0
+    if mtime == _LOG_CACHE["mtime"]:
+        return _LOG_CACHE
+
+    recent = []
+    if mtime:
+        try:
+            # Only the last 3 sessions feed the context
+            with open(WELLNESS_LOG_PATH, "r") as f:
+                tail = deque((line for line in f if line.strip()), maxlen=3)
+            recent = [json.loads(line) for line in tail]
+            logger.info(f"Loaded {len(recent)} recent sessions")
+        except Exception as e:
+            logger.error(f"Error loading wellness log: {e}")
+
+    _LOG_CACHE.update(mtime=mtime, sessions=recent, context=_render_history_context(recent))
+    return _LOG_CACHE
 
-                {history_context}
+
+def _append_checkin(session: dict) -> None:
+    with open(WELLNESS_LOG_PATH, "a") as f:
+        f.write(json.dumps(session, separators=(",", ":")) + "\n")
+
+
+# Static system prompt, shared by every session. The per-user history goes
+# after it so the whole static text is a stable prefix for Gemini's implicit
+# prompt caching.
+WELLNESS_INSTRUCTIONS = """
+                You are a supportive daily wellness companion. Your role is to conduct a brief, friendly check-in with the user about their wellbeing and daily intentions.
 
                 CONVERSATION FLOW:
                 1. GREETING: Start with a warm greeting. If there's previous session data, reference it briefly.
@@ -88,33 +118,27 @@ class WellnessAssistant(Agent):
                 WHEN TO SAVE:
                 - Only call save_wellness_checkin AFTER user confirms the summary is correct
                 - Include ALL collected information: mood, energy, goals, and a brief note
-                """,
-        )
+                """
 
-    def _load_wellness_log(self) -> list:
-        try:
-            if WELLNESS_LOG_PATH.exists():
-                with open(WELLNESS_LOG_PATH, "r") as f:
-                    data = json.load(f)
-                    logger.info(f"Loaded {len(data.get('sessions', []))} previous sessions")
-                    return data.get("sessions", [])
-        except Exception as e:
-            logger.error(f"Error loading wellness log: {e}")
-        
-        return []
 
-    def _build_history_context(self) -> str:
-        if not self.previous_sessions:
-            return "PREVIOUS SESSIONS: None. This is the user's first check-in."
-        
-        # Get last 3 sessions (most recent)
-        recent = self.previous_sessions[-3:]
-        context = "PREVIOUS SESSIONS (for reference only - mention naturally, don't list):\n"
+class WellnessAssistant(Agent):
+    def __init__(self, log: dict):
+        # Previous sessions loaded off the event loop by the entrypoint
+        self.previous_sessions = log["sessions"]
+        self.current_session = {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "time": datetime.now().strftime("%H:%M:%S"),
+            "mood": None,
+            "energy": None,
+            "goals": [],
+            "notes": None
+        }
         
-        for session in recent:
-            context += f"- {session['date']}: Mood: {session['mood']}, Energy: {session['energy']}, Goals: {', '.join(session['goals'])}\n"
+        history_context = log["context"]
         
-        return context
+        super().__init__(
+            instructions="".join([WELLNESS_INSTRUCTIONS, history_context]),
+        )
 
     @function_tool
     async def save_wellness_checkin(
@@ -133,19 +157,11 @@ class WellnessAssistant(Agent):
         })
         
         try:
-            # Load existing log or create new structure
-            if WELLNESS_LOG_PATH.exists():
-                with open(WELLNESS_LOG_PATH, "r") as f:
-                    wellness_data = json.load(f)
-            else:
-                wellness_data = {"sessions": []}
-            
-            # Add this session to the log
-            wellness_data["sessions"].append(self.current_session)
-            
-            # Save to file with nice formatting
-            with open(WELLNESS_LOG_PATH, "w") as f:
-                json.dump(wellness_data, f, indent=2)
+            # Append this session as one line; no read or rewrite of the history
+            await asyncio.to_thread(_append_checkin, self.current_session)
+            # Make the next session pick up this check-in even if the mtime
+            # didn't tick
+            _LOG_CACHE["mtime"] = None
             
             logger.info(f"Wellness check-in saved: {self.current_session}")
             
@@ -177,7 +193,7 @@ class WellnessAssistant(Agent):
 
 
 def prewarm(proc: JobProcess):
-    proc.userdata["vad"] = silero.VAD.load()
+    build_pipeline(proc)
 
 
 async def entrypoint(ctx: JobContext):
@@ -191,20 +207,13 @@ async def entrypoint(ctx: JobContext):
     session = AgentSession(
         # Speech-to-text (STT) is your agent's ears, turning the user's speech into text that the LLM can understand
         # See all available models at https://docs.livekit.io/agents/models/stt/
-        stt=deepgram.STT(model="nova-3"),
+        stt=ctx.proc.userdata["stt"],
         # A Large Language Model (LLM) is your agent's brain, processing user input and generating a response
         # See all available models at https://docs.livekit.io/agents/models/llm/
-        llm=google.LLM(
-                model="gemini-2.5-flash",
-            ),
+        llm=ctx.proc.userdata["llm"],
         # Text-to-speech (TTS) is your agent's voice, turning the LLM's text into speech that the user can hear
         # See all available models as well as voice selections at https://docs.livekit.io/agents/models/tts/
-        tts=murf.TTS(
-                voice="en-US-matthew", 
-                style="Conversation",
-                tokenizer=tokenize.basic.SentenceTokenizer(min_sentence_len=2),
-                text_pacing=True
-            ),
+        tts=ctx.proc.userdata["tts"],
         # VAD and turn detection are used to determine when the user is speaking and when the agent should respond
         # See more at https://docs.livekit.io/agents/build/turns
         turn_detection=MultilingualModel(),
@@ -247,13 +256,16 @@ async def entrypoint(ctx: JobContext):
     # # Start the avatar and wait for it to join
     # await avatar.start(session, room=ctx.room)
 
+    # Read the wellness log on a worker thread so the event loop never blocks on disk
+    wellness_log = await asyncio.to_thread(_refresh_log_cache)
+
     # Start the session, which initializes the voice pipeline and warms up the models
     await session.start(
-        agent=WellnessAssistant(),
+        agent=WellnessAssistant(wellness_log),
         room=ctx.room,
         room_input_options=RoomInputOptions(
             # For telephony applications, use `BVCTelephony` for best results
-            noise_cancellation=noise_cancellation.BVC(),
+            noise_cancellation=get_noise_cancellation(),
         ),
     )
 
@@ -0,0 +1,17 @@
+import pytest
+
+import catalog
+
+
+@pytest.fixture
+def orders_file(tmp_path, monkeypatch):
+    """Point the catalog's order log at an empty file under tmp_path."""
+    path = tmp_path / "orders.jsonl"
+    path.touch()
+    monkeypatch.setattr(catalog, "ORDERS_FILE", str(path))
+    monkeypatch.setattr(catalog, "_ORDER_LOG", catalog.OrderLog(str(path)))
+    monkeypatch.setattr(catalog, "_ORDERS", [])
+    monkeypatch.setattr(catalog, "_ORDERS_BY_ID", {})
+    monkeypatch.setattr(catalog, "_ORDERS_SIGNATURE", None)
+    monkeypatch.setattr(catalog, "_ORDERS_OFFSET", 0)
+    return path
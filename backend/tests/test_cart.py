@@ -0,0 +1,108 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+import ecommerceAgent  # noqa: E402
+import foodAgent  # noqa: E402
+
+_FOOD_CATALOG = Path(__file__).resolve().parents[1] / "shared-data" / "catalog.json"
+
+
+def _cart_sum(cart: dict) -> float:
+    return sum(line["price"] * line["quantity"] for line in cart.values())
+
+
+async def test_shopping_cart_total_tracks_every_change(orders_file):
+    agent = ecommerceAgent.ShoppingAssistant()
+
+    await agent.add_to_cart("Stoneware Coffee Mug", 2, "")
+    await agent.add_to_cart("Stoneware Coffee Mug", 1, "")
+    assert agent._cart_total == _cart_sum(agent.cart)
+
+    await agent.add_items_to_cart(
+        ["Black Pullover Hoodie", "Black Pullover Hoodie", "No Such Product"],
+        [1, 2, 1],
+        ["L", "M", ""],
+    )
+    assert len(agent.cart) == 3
+    assert agent._cart_total == _cart_sum(agent.cart)
+
+    await agent.remove_from_cart("Black Pullover Hoodie", "M")
+    assert agent._cart_total == _cart_sum(agent.cart)
+
+    expected_total = agent._cart_total
+    await agent.place_order()
+    assert ecommerceAgent.get_last_order()["total"] == expected_total
+    assert agent.cart == {}
+    assert agent._cart_total == 0
+
+
+@pytest.fixture
+def grocery_agent():
+    with open(_FOOD_CATALOG) as f:
+        catalog = json.load(f)
+    name_index, items_by_id, recipe_index, recipe_tokens = foodAgent._index_catalog(catalog)
+    return foodAgent.Assistant(
+        asyncio.Queue(),
+        catalog,
+        name_index,
+        items_by_id,
+        recipe_index,
+        recipe_tokens,
+        foodAgent._render_instructions(catalog),
+    )
+
+
+async def test_grocery_cart_total_tracks_every_change(grocery_agent):
+    await grocery_agent.add_to_cart("tomatoes", 2)
+    await grocery_agent.add_to_cart("Tomatoes", 0.5)
+    assert grocery_agent._cart_total == _cart_sum(grocery_agent.cart)
+
+    await grocery_agent.add_items_to_cart(["milk", "bread", "caviar"], [2, 1, 1])
+    await grocery_agent.add_ingredients(None, "breakfast")
+    assert grocery_agent._cart_total == _cart_sum(grocery_agent.cart)
+
+    await grocery_agent.remove_from_cart(None, "bread")
+    assert grocery_agent._cart_total == _cart_sum(grocery_agent.cart)
+
+    expected_total = grocery_agent._cart_total
+    await grocery_agent.place_order(None)
+    order = grocery_agent._order_queue.get_nowait()
+    assert order["total"] == expected_total == _cart_sum({i["id"]: i for i in order["items"]})
+    assert grocery_agent.cart == {}
+    assert grocery_agent._cart_total == 0
+
+
+async def test_shopping_cart_unknown_product_asks_which_one():
+    agent = ecommerceAgent.ShoppingAssistant()
+
+    reply = await agent.add_to_cart("Quantum Flux Capacitor", 1, "")
+
+    assert reply.startswith("I'm not sure which product you mean")
+    assert agent.cart == {}
+
+
+async def test_shopping_cart_sizes_ignore_case_and_spacing():
+    agent = ecommerceAgent.ShoppingAssistant()
+
+    await agent.add_to_cart("Black Pullover Hoodie", 1, "L")
+    await agent.add_items_to_cart(["Black Pullover Hoodie"], [2], ["l "])
+    assert list(agent.cart) == [(ecommerceAgent.get_product_by_name("Black Pullover Hoodie")["id"], "L")]
+    assert next(iter(agent.cart.values()))["quantity"] == 3
+
+    await agent.remove_from_cart("Black Pullover Hoodie", " l")
+    assert agent.cart == {}
+    assert agent._cart_total == 0
+
+
+async def test_grocery_batch_add_clamps_quantities_and_always_replies(grocery_agent):
+    await grocery_agent.add_items_to_cart(["milk", "bread"], [0, -2])
+    assert [line["quantity"] for line in grocery_agent.cart.values()] == [1, 1]
+    assert grocery_agent._cart_total == _cart_sum(grocery_agent.cart)
+
+    assert await grocery_agent.add_items_to_cart([], [])
+    assert await grocery_agent.add_items_to_cart(["caviar"], [1])
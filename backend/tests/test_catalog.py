@@ -0,0 +1,85 @@
+import itertools
+import json
+import re
+
+import pytest
+
+import catalog
+
+
+def _naive_list_products(category=None, max_price=None, color=None, keyword=None):
+    """The original linear-scan filter that list_products must agree with."""
+    filtered = catalog.load_products()
+    if category:
+        filtered = [p for p in filtered if p.get("category", "").lower() == category.lower()]
+    if max_price:
+        filtered = [p for p in filtered if p.get("price", 0) <= max_price]
+    if color:
+        filtered = [p for p in filtered if p.get("color", "").lower() == color.lower()]
+    if keyword:
+        keyword_lower = keyword.lower()
+        filtered = [
+            p for p in filtered
+            if keyword_lower in p.get("name", "").lower()
+            or keyword_lower in p.get("description", "").lower()
+        ]
+    return filtered
+
+
+@pytest.mark.parametrize(
+    "category, max_price, color, keyword",
+    list(itertools.product(
+        [None, "mug", "Hoodie", "unknown"],
+        [None, 0, 500, 1000, 1800, 100000],
+        [None, "black", "WHITE", "purple"],
+        [None, "cotton", "Mug", "zzz"],
+    )),
+)
+def test_list_products_matches_naive_filter(category, max_price, color, keyword):
+    expected = _naive_list_products(category, max_price, color, keyword)
+    assert catalog.list_products(category, max_price, color, keyword) == expected
+
+
+def test_list_products_returns_fresh_list():
+    first = catalog.list_products(category="mug")
+    first.clear()
+    assert catalog.list_products(category="mug") == _naive_list_products(category="mug")
+
+
+async def test_create_order_assigns_unique_ids_and_appends(orders_file):
+    first = await catalog.create_order([{"product_name": "Stoneware Coffee Mug", "quantity": 2}])
+    second = await catalog.create_order([{"product_name": "Black Pullover Hoodie", "quantity": 1, "size": "L"}])
+
+    assert re.fullmatch(r"order-\d{14}-[0-9a-f]{6}", first["id"])
+    assert first["id"] != second["id"]
+    assert first["total"] == 2 * catalog.get_product_by_name("Stoneware Coffee Mug")["price"]
+    assert second["items"][0]["size"] == "L"
+
+    logged = [json.loads(line) for line in orders_file.read_text().splitlines()]
+    assert logged == [first, second]
+    assert catalog.get_last_order() == second
+    assert catalog.get_order_by_id(first["id"]) == first
+
+
+async def test_orders_from_other_processes_are_visible(orders_file):
+    mine = await catalog.create_order([{"product_name": "Stoneware Coffee Mug", "quantity": 1}])
+    assert catalog.get_last_order() == mine
+
+    # Another worker appends to the same log, the last line still being written
+    theirs = {"id": "order-20250101000000-abcdef", "items": [], "total": 0, "currency": "INR",
+              "created_at": "2025-01-01T00:00:00+00:00", "status": "confirmed"}
+    with open(orders_file, "a") as f:
+        f.write(json.dumps(theirs) + "\n" + '{"id": "order-partial"')
+
+    assert catalog.get_last_order() == theirs
+    assert catalog.get_order_by_id(mine["id"]) == mine
+    assert catalog.get_order_by_id("order-partial") is None
+
+
+def test_save_orders_rewrite_is_reread(orders_file):
+    order = {"id": "order-20250101000000-abcdef", "items": [], "total": 0}
+    catalog.save_orders([order])
+    assert catalog.get_last_order() == order
+
+    orders_file.write_text("")
+    assert catalog.get_last_order() is None
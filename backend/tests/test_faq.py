@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+from SDR_Agent import _FAQ_SECTIONS, _find_faq_section  # noqa: E402
+
+
+@pytest.mark.parametrize(
+    "topic, heading",
+    [
+        ("pricing", "pricing"),
+        ("Key Features", "key features"),
+        ("payment gateway pricing", "pricing"),
+        ("payment links", "products"),
+        ("who are your customers", "who is this for"),
+        ("fees", "pricing"),
+        ("How much does it cost", "pricing"),
+        ("is it free", "free tier"),
+        ("customer support", "support"),
+        ("UPI", "products"),
+        ("Shopify", "integration"),
+        ("pricng", "pricing"),
+        ("what do you do", "what we do"),
+    ],
+)
+def test_find_faq_section_routes_topics(topic, heading):
+    assert _find_faq_section(topic) == heading
+
+
+@pytest.mark.parametrize("topic", ["weather", "team size"])
+def test_find_faq_section_rejects_unknown_topics(topic):
+    assert _find_faq_section(topic) is None
+
+
+def test_every_heading_routes_to_itself():
+    assert all(_find_faq_section(heading) == heading for heading in _FAQ_SECTIONS)